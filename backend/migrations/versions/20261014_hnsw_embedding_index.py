@@ -0,0 +1,30 @@
+"""replace the ivfflat chunk index with hnsw"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261014_hnsw_embedding_index"
+down_revision = "20250618_enable_pgvector"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Rebuild the embedding index as HNSW."""
+    op.execute("DROP INDEX IF EXISTS document_chunks_embedding_idx")
+    op.execute("SET maintenance_work_mem = '2GB'")
+    op.execute("SET max_parallel_maintenance_workers = 7")
+    op.execute(
+        """
+        CREATE INDEX document_chunks_embedding_idx ON document_chunks
+        USING hnsw (embedding vector_cosine_ops) WITH (m = 24, ef_construction = 128)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Restore the original ivfflat index."""
+    op.execute("DROP INDEX IF EXISTS document_chunks_embedding_idx")
+    op.execute(
+        "CREATE INDEX document_chunks_embedding_idx ON document_chunks USING ivfflat (embedding vector_cosine_ops)"
+    )
@@ -0,0 +1,29 @@
+"""store the document source on each chunk"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261015_chunk_source"
+down_revision = "20261015_inner_product_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Copy ``documents.source`` onto chunks and index it for filtering."""
+    op.execute("ALTER TABLE document_chunks ADD COLUMN source TEXT")
+    op.execute(
+        """
+        UPDATE document_chunks c SET source = d.source
+        FROM documents d WHERE d.id = c.document_id
+        """
+    )
+    op.execute(
+        "CREATE INDEX document_chunks_source_idx ON document_chunks (source)"
+    )
+
+
+def downgrade() -> None:
+    """Drop the chunk source column and its index."""
+    op.execute("DROP INDEX IF EXISTS document_chunks_source_idx")
+    op.execute("ALTER TABLE document_chunks DROP COLUMN IF EXISTS source")
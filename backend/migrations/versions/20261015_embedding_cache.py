@@ -0,0 +1,26 @@
+"""cache chunk embeddings by content hash"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261015_embedding_cache"
+down_revision = "20261015_halfvec_embeddings"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create the embedding_cache table."""
+    op.execute(
+        """
+        CREATE TABLE embedding_cache (
+            content_sha256 BYTEA PRIMARY KEY,
+            embedding halfvec(768) NOT NULL
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Drop the embedding_cache table."""
+    op.execute("DROP TABLE IF EXISTS embedding_cache")
@@ -0,0 +1,47 @@
+"""store chunk embeddings as halfvec"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261015_halfvec_embeddings"
+down_revision = "20261014_hnsw_embedding_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Convert embeddings to half precision and rebuild the HNSW index."""
+    op.execute("DROP INDEX IF EXISTS document_chunks_embedding_idx")
+    op.execute(
+        """
+        ALTER TABLE document_chunks
+        ALTER COLUMN embedding TYPE halfvec(768) USING embedding::halfvec(768)
+        """
+    )
+    op.execute("SET maintenance_work_mem = '2GB'")
+    op.execute("SET max_parallel_maintenance_workers = 7")
+    op.execute(
+        """
+        CREATE INDEX document_chunks_embedding_idx ON document_chunks
+        USING hnsw (embedding halfvec_cosine_ops) WITH (m = 24, ef_construction = 128)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Restore full precision embeddings."""
+    op.execute("DROP INDEX IF EXISTS document_chunks_embedding_idx")
+    op.execute(
+        """
+        ALTER TABLE document_chunks
+        ALTER COLUMN embedding TYPE vector(768) USING embedding::vector(768)
+        """
+    )
+    op.execute("SET maintenance_work_mem = '2GB'")
+    op.execute("SET max_parallel_maintenance_workers = 7")
+    op.execute(
+        """
+        CREATE INDEX document_chunks_embedding_idx ON document_chunks
+        USING hnsw (embedding vector_cosine_ops) WITH (m = 24, ef_construction = 128)
+        """
+    )
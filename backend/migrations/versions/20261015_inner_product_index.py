@@ -0,0 +1,37 @@
+"""index unit-length embeddings by inner product"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261015_inner_product_index"
+down_revision = "20261015_embedding_cache"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Normalize stored embeddings and rebuild the HNSW index with ip ops."""
+    op.execute("DROP INDEX IF EXISTS document_chunks_embedding_idx")
+    op.execute("UPDATE document_chunks SET embedding = l2_normalize(embedding)")
+    op.execute("UPDATE embedding_cache SET embedding = l2_normalize(embedding)")
+    op.execute("SET maintenance_work_mem = '2GB'")
+    op.execute("SET max_parallel_maintenance_workers = 7")
+    op.execute(
+        """
+        CREATE INDEX document_chunks_embedding_idx ON document_chunks
+        USING hnsw (embedding halfvec_ip_ops) WITH (m = 24, ef_construction = 128)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Restore the cosine-distance HNSW index."""
+    op.execute("DROP INDEX IF EXISTS document_chunks_embedding_idx")
+    op.execute("SET maintenance_work_mem = '2GB'")
+    op.execute("SET max_parallel_maintenance_workers = 7")
+    op.execute(
+        """
+        CREATE INDEX document_chunks_embedding_idx ON document_chunks
+        USING hnsw (embedding halfvec_cosine_ops) WITH (m = 24, ef_construction = 128)
+        """
+    )
@@ -0,0 +1,24 @@
+"""compress chunk text with lz4"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261015_lz4_chunk_content"
+down_revision = "20261015_chunk_source"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Compress new chunk text with lz4 and let TOAST compress smaller rows."""
+    op.execute("ALTER TABLE document_chunks ALTER COLUMN content SET COMPRESSION lz4")
+    # Rows are compressed once they exceed this many bytes (default ~2 kB).
+    op.execute("ALTER TABLE document_chunks SET (toast_tuple_target = 1024)")
+
+
+def downgrade() -> None:
+    """Restore the default compression settings."""
+    op.execute("ALTER TABLE document_chunks RESET (toast_tuple_target)")
+    op.execute(
+        "ALTER TABLE document_chunks ALTER COLUMN content SET COMPRESSION default"
+    )
@@ -1,17 +1,70 @@
 """Minimal RAG sub-graph."""
 from __future__ import annotations
 
-from langchain_core.messages import AIMessage
+import threading
+from typing import TYPE_CHECKING
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
 
 from .state import OverallState
 
+if TYPE_CHECKING:
+    from api.documents import HybridVectorStore
+
+_vector_store: HybridVectorStore | None = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> HybridVectorStore:
+    """Return the process-wide document store, creating it on first use.
+
+    The documents API and the RAG sub-graph share this instance, so uploads
+    are visible to the graph and both use the same semantic cache.
+    """
+    global _vector_store
+    with _vector_store_lock:
+        if _vector_store is None:
+            from api.documents import HybridVectorStore
+
+            _vector_store = HybridVectorStore()
+        return _vector_store
+
+
+def _latest_question(messages: list[AnyMessage]) -> str:
+    """Return the content of the most recent human message."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content
+    return ""
+
 
 def retrieve_documents(state: OverallState, config: RunnableConfig) -> OverallState:
-    """Return an empty answer string."""
-    return {"messages": [AIMessage(content="")]}  # pragma: no cover
+    """Answer with the chunks most similar to the latest question.
 
+    Only the latest human message is embedded, so a repeated question hits
+    the store's semantic cache regardless of the conversation before it.
+    Its embedding is kept in ``query_embeddings``, which holds only the
+    latest question, so rerunning the node for it skips the embedding call.
+    """
+    question = _latest_question(state["messages"])
+    if not question:
+        return {"messages": [AIMessage(content="")]}
+    store = get_vector_store()
+    embedding = (state.get("query_embeddings") or {}).get(question)
+    if embedding is None:
+        embedding = next(iter(store.embed_queries([question])), None)
+    if embedding is None:
+        docs = store.similarity_search(question)
+    else:
+        docs = store.similarity_search_by_vector(embedding)
+    return {
+        "messages": [
+            AIMessage(content="\n\n".join(doc.page_content for doc in docs))
+        ],
+        "query_embeddings": {} if embedding is None else {question: embedding},
+    }
 
 
 def create_rag_graph():
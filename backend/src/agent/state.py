@@ -20,6 +20,8 @@ class OverallState(TypedDict):
     research_loop_count: int
     reasoning_model: str
     use_documents: bool
+    # Embedding of the latest RAG question, keyed by its text.
+    query_embeddings: dict
 
 
 class ReflectionState(TypedDict):
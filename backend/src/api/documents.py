@@ -1,71 +1,695 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import os
-import tempfile
-from typing import List, Optional
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Executor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+)
 
+import aiofiles.tempfile
+import numpy as np
 from fastapi import APIRouter, Depends, File, UploadFile, Request
 from pydantic import BaseModel
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pypdf import PdfReader
+
+from rag.document_processor import extract_pages
+from rag.embeddings import ConfigError, EmbeddingService
+from rag.semantic_cache import SemanticCache
+
+if TYPE_CHECKING:
+    import psycopg
+    from psycopg_pool import ConnectionPool
+
+# HNSW parameters by corpus size: (exclusive row limit, params). The first
+# tier matches the index built by the migrations.
+_HNSW_TIERS = (
+    (1_000_000, {"m": 24, "ef_construction": 128, "ef_search": 100}),
+    (10_000_000, {"m": 32, "ef_construction": 200, "ef_search": 200}),
+    (None, {"m": 48, "ef_construction": 256, "ef_search": 400}),
+)
+HNSW_EF_SEARCH = _HNSW_TIERS[0][1]["ef_search"]
+_INDEX_NAME = "document_chunks_embedding_idx"
+# Postgres advisory lock key held by whichever worker is rebuilding the index.
+_REINDEX_LOCK_KEY = 0x686E_7377
+# Query texts whose embeddings are kept in process by ``embed_queries``.
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+# Width of the ``document_chunks.embedding`` column.
+EMBEDDING_DIMENSION = 768
+
+_NEAREST_SQL = """
+SELECT id, content, chunk_index, source
+FROM document_chunks
+ORDER BY embedding <#> %s::halfvec(768)
+LIMIT %s
+"""
+_NEAREST_IN_SOURCE_SQL = """
+SELECT id, content, chunk_index, source
+FROM document_chunks
+WHERE source = %s
+ORDER BY embedding <#> %s::halfvec(768)
+LIMIT %s
+"""
+
+
+def hnsw_params(n_vectors: int) -> Dict[str, int]:
+    """Return HNSW build and search parameters sized for ``n_vectors`` rows."""
+    for limit, params in _HNSW_TIERS:
+        if limit is None or n_vectors < limit:
+            return dict(params)
+    raise AssertionError("unreachable")
+
+
+def _ef_search_for_m(m: int) -> int:
+    """Return the ``ef_search`` paired with an index built using ``m``."""
+    for _, params in _HNSW_TIERS:
+        if params["m"] == m:
+            return params["ef_search"]
+    return HNSW_EF_SEARCH
+
+
+def _pg_dsn(url: str) -> str:
+    """Strip a SQLAlchemy driver suffix so libpq accepts the URL."""
+    return re.sub(r"^postgresql\+\w+://", "postgresql://", url)
+
+
+def _vector_literal(values: Sequence[float]) -> str:
+    return "[" + ",".join(map(str, values)) + "]"
+
+
+def _parse_vector(text: str) -> List[float]:
+    """Parse pgvector's ``[x,y,...]`` text output."""
+    return [float(x) for x in text.strip("[]").split(",")]
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return indices of the ``k`` highest scores, best first.
+
+    ``argpartition`` selects the candidates in O(N); only those ``k`` are
+    sorted.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
 
 
 class DocumentProcessor:
-    """Simple PDF processor that splits documents into chunks."""
+    """Simple PDF processor that splits documents into chunks.
+
+    Results are remembered by the SHA-256 of the file contents for the last
+    ``cache_size`` files, so re-uploading a file skips extraction and
+    splitting.
+    """
+
+    def __init__(
+        self, chunk_size: int = 1000, chunk_overlap: int = 200, cache_size: int = 64
+    ) -> None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200) -> None:
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size, chunk_overlap=chunk_overlap
         )
+        self.cache_size = cache_size
+        self._cache: OrderedDict[bytes, List[Document]] = OrderedDict()
+        self._cache_lock = threading.Lock()
 
-    def process(self, file_path: str) -> List[Document]:
-        """Load a PDF file and return split documents."""
-        reader = PdfReader(file_path)
-        docs: List[Document] = []
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text() or ""
-            docs.append(
-                Document(
-                    page_content=text,
-                    metadata={"page": i + 1, "source": os.path.basename(file_path)},
-                )
+    def process(
+        self,
+        file_path: str,
+        source: Optional[str] = None,
+        content_hash: Optional[bytes] = None,
+        executor: Optional[Executor] = None,
+    ) -> List[Document]:
+        """Load a PDF file and return split documents.
+
+        ``source`` names the document in chunk metadata and defaults to the
+        file name. ``content_hash`` is the SHA-256 digest of the file; it is
+        computed from the file when omitted. Page text is extracted on
+        ``executor`` when one is given; see ``extract_pages``.
+        """
+        source = source or os.path.basename(file_path)
+        if content_hash is None:
+            content_hash = _file_sha256(file_path)
+        with self._cache_lock:
+            cached = self._cache.get(content_hash)
+            if cached is not None:
+                self._cache.move_to_end(content_hash)
+        if cached is None:
+            docs = [
+                Document(page_content=text, metadata={"page": i + 1})
+                for i, text in enumerate(extract_pages(file_path, executor))
+            ]
+            cached = self.splitter.split_documents(docs)
+            with self._cache_lock:
+                self._cache[content_hash] = cached
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return [
+            Document(
+                page_content=doc.page_content, metadata={**doc.metadata, "source": source}
+            )
+            for doc in cached
+        ]
+
+
+def _file_sha256(file_path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(UPLOAD_CHUNK_SIZE):
+            digest.update(block)
+    return digest.digest()
+
+
+def _write_atomic(path: str, write: Callable[[BinaryIO], Any]) -> None:
+    """Write ``path`` through ``write`` so readers never see a partial file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class PgEmbeddingCache:
+    """Embedding cache stored in the ``embedding_cache`` table."""
+
+    def __init__(self, connect: Callable[[], "psycopg.Connection"]) -> None:
+        self._connect = connect
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT content_sha256, embedding::text FROM embedding_cache"
+                " WHERE content_sha256 = ANY(%s)",
+                (keys,),
+            ).fetchall()
+        return {bytes(key): _parse_vector(vector) for key, vector in rows}
+
+    def put_many(self, embeddings: Dict[bytes, List[float]]) -> None:
+        with self._connect() as conn, conn.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO embedding_cache (content_sha256, embedding)"
+                " VALUES (%s, %s::halfvec(768)) ON CONFLICT DO NOTHING",
+                [(key, _vector_literal(v)) for key, v in embeddings.items()],
             )
-        return self.splitter.split_documents(docs)
 
 
 class HybridVectorStore:
-    """Very small in-memory vector store using TF-IDF."""
+    """Vector store backed by pgvector, with an in-memory fallback.
 
-    def __init__(self) -> None:
-        from sklearn.feature_extraction.text import TfidfVectorizer
+    Chunks are embedded and written to ``document_chunks`` when
+    ``DATABASE_URL`` is configured; retrieval then runs as an HNSW nearest
+    neighbour query inside Postgres. Without a database the store keeps its
+    index in process: normalized float32 embeddings scored with one
+    matrix-vector product when ``EMBEDDING_MODEL`` is set, hashed term
+    frequencies otherwise. Embeddings are cached by content hash in
+    ``embedding_cache``, or without a database in the SQLite file named by
+    ``EMBEDDING_CACHE_PATH``.
+    """
 
-        self.vectorizer = TfidfVectorizer()
-        self.documents: List[Document] = []
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        embeddings: Optional[EmbeddingService] = None,
+    ) -> None:
+        self.database_url = database_url or os.getenv("DATABASE_URL")
+        self.embeddings = embeddings
+        if self.embeddings is None and self.database_url:
+            self.embeddings = EmbeddingService(cache=PgEmbeddingCache(self._connect))
+        elif self.embeddings is None and os.getenv("EMBEDDING_MODEL"):
+            cache_path = os.getenv("EMBEDDING_CACHE_PATH")
+            cache = None
+            if cache_path:
+                from rag.embedding_cache import SqliteEmbeddingCache
+
+                cache = SqliteEmbeddingCache(cache_path)
+            self.embeddings = EmbeddingService(cache=cache)
+        dimension = self.embeddings.dimension if self.embeddings else None
+        if self.database_url and dimension not in (None, EMBEDDING_DIMENSION):
+            raise ConfigError(
+                f"{self.embeddings.model_name} produces {dimension}-dimensional "
+                f"embeddings; document_chunks stores {EMBEDDING_DIMENSION}"
+            )
+        self.ef_search = HNSW_EF_SEARCH
+        self._index_m: Optional[int] = None
+        self._reindex_lock = threading.Lock()
+        self._pool: Optional[ConnectionPool] = None
+        self._query_embeddings: OrderedDict[str, List[float]] = OrderedDict()
+        self._query_embeddings_lock = threading.Lock()
+        self.cache: Optional[SemanticCache] = None
+        # Stateless, built on the first lexical insert; see ``_get_vectorizer``.
+        self.vectorizer = None
+        # In-memory chunks are stored column-wise; ``Document`` objects are
+        # only built for search results (see ``_document``).
+        self._texts: List[str] = []
+        self._metadata: List[dict] = []
         self._matrix = None
+        # (capacity, D) float32 buffer; the first ``_size`` rows hold one
+        # L2-normalized embedding per stored chunk.
+        self._dense: Optional[np.ndarray] = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _configure_connection(self, conn: psycopg.Connection) -> None:
+        """Apply per-session search settings and pgvector adapters."""
+        from pgvector.psycopg import register_vector
+
+        conn.execute(f"SET hnsw.ef_search = {int(self.ef_search)}")
+        register_vector(conn)
+        conn.commit()
+
+    def _setup_connection(self, conn: psycopg.Connection) -> None:
+        if self._index_m is None:
+            self._load_index_params(conn)
+        self._configure_connection(conn)
+
+    def _connect(
+        self, autocommit: bool = False
+    ) -> ContextManager[psycopg.Connection]:
+        """Return a connection to use in a ``with`` block.
+
+        Transactional work borrows from the pool when one is open. Autocommit
+        sessions, used for maintenance, always get a dedicated connection.
+        """
+        if self._pool is not None and not autocommit:
+            return self._pool.connection()
+        import psycopg
+
+        conn = psycopg.connect(_pg_dsn(self.database_url), autocommit=autocommit)
+        self._setup_connection(conn)
+        return conn
+
+    def open_pool(self, min_size: int = 4, max_size: int = 32) -> None:
+        """Serve connections from a pool instead of connecting per call.
+
+        Pooled sessions keep their search settings and server-side prepared
+        statements between requests.
+        """
+        if not self.database_url or self._pool is not None:
+            return
+        from psycopg_pool import ConnectionPool
+
+        self._pool = ConnectionPool(
+            _pg_dsn(self.database_url),
+            min_size=min_size,
+            max_size=max_size,
+            configure=self._setup_connection,
+            open=False,
+        )
+        self._pool.open()
+
+    def close_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    @staticmethod
+    def _live_index_m(conn: psycopg.Connection) -> int:
+        """Return the ``m`` the live HNSW index was built with."""
+        row = conn.execute(
+            "SELECT reloptions FROM pg_class WHERE relname = %s", (_INDEX_NAME,)
+        ).fetchone()
+        options = dict(opt.split("=", 1) for opt in (row[0] or [])) if row else {}
+        return int(options.get("m", 16))
+
+    def _load_index_params(self, conn: psycopg.Connection) -> None:
+        """Derive ``ef_search`` from the ``m`` the live index was built with."""
+        self._index_m = self._live_index_m(conn)
+        self.ef_search = _ef_search_for_m(self._index_m)
+        conn.commit()
+
+    def _adopt_index_m(self, m: int) -> None:
+        """Search with the ``ef_search`` suited to an index built with ``m``."""
+        self._index_m = m
+        self.ef_search = _ef_search_for_m(m)
+        if self._pool is not None:
+            # Replace pooled sessions so they pick up the new ef_search.
+            self._pool.drain()
+
+    @staticmethod
+    def _vector_count(conn: psycopg.Connection) -> int:
+        """Return the planner's row estimate for ``document_chunks``."""
+        row = conn.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = 'document_chunks'::regclass"
+        ).fetchone()
+        return max(int(row[0]), 0)
 
     def add_documents(self, docs: List[Document]) -> None:
-        self.documents.extend(docs)
-        texts = [d.page_content for d in self.documents]
-        self._matrix = self.vectorizer.fit_transform(texts)
+        if not self.database_url:
+            if self.embeddings is not None:
+                self._add_dense(docs)
+                return
+            if not docs:
+                return
+            from scipy.sparse import vstack
+
+            rows = self._get_vectorizer().transform([d.page_content for d in docs])
+            with self._lock:
+                self._append(docs)
+                self._matrix = (
+                    rows
+                    if self._matrix is None
+                    else vstack([self._matrix, rows], format="csr")
+                )
+            return
+        if not docs:
+            return
+        from pgvector import HalfVector
+
+        embeddings = self.embeddings.embed_texts([d.page_content for d in docs])
+        sources = list({d.metadata.get("source") for d in docs})
+        with self._connect() as conn:
+            document_ids = dict(
+                conn.execute(
+                    "INSERT INTO documents (source) SELECT unnest(%s::text[])"
+                    " RETURNING source, id",
+                    (sources,),
+                ).fetchall()
+            )
+            positions: Counter = Counter()
+            with conn.cursor().copy(
+                "COPY document_chunks"
+                " (document_id, chunk_index, content, source, embedding)"
+                " FROM STDIN WITH (FORMAT BINARY)"
+            ) as copy:
+                copy.set_types(["int8", "int4", "text", "text", "halfvec"])
+                for doc, embedding in zip(docs, embeddings):
+                    source = doc.metadata.get("source")
+                    copy.write_row(
+                        (
+                            document_ids[source],
+                            positions[source],
+                            doc.page_content,
+                            source,
+                            HalfVector(embedding),
+                        )
+                    )
+                    positions[source] += 1
+        # Cleared only once the rows are committed: a search made while they
+        # were being inserted would otherwise cache results without them.
+        if self.cache is not None:
+            self.cache.clear()
+        self._maybe_reindex()
 
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        if not self.documents:
+    def _maybe_reindex(self) -> None:
+        """Rebuild the index in the background once the corpus outgrows it.
+
+        The live index's ``m`` is read from the catalog each time, since
+        another worker may have rebuilt it since this one connected.
+        """
+        with self._connect() as conn:
+            params = hnsw_params(self._vector_count(conn))
+            index_m = self._live_index_m(conn)
+        if index_m != self._index_m:
+            self._adopt_index_m(index_m)
+        if params["m"] == index_m or not self._reindex_lock.acquire(False):
+            return
+
+        def run() -> None:
+            try:
+                self.reindex(params)
+            finally:
+                self._reindex_lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed ``queries`` in one batch.
+
+        The embeddings of the last ``QUERY_EMBEDDING_CACHE_SIZE`` distinct
+        query texts are reused without calling the embedding service. Returns
+        an empty list when the store has no embedding service and searches
+        lexically instead.
+        """
+        if self.embeddings is None or not queries:
             return []
-        from sklearn.metrics.pairwise import cosine_similarity
+        cache = self._query_embeddings
+        with self._query_embeddings_lock:
+            found = {q: cache[q] for q in queries if q in cache}
+            for query in found:
+                cache.move_to_end(query)
+        missing = [q for q in dict.fromkeys(queries) if q not in found]
+        if missing:
+            computed = dict(zip(missing, self.embeddings.embed_texts(missing)))
+            found.update(computed)
+            with self._query_embeddings_lock:
+                cache.update(computed)
+                while len(cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return [found[q] for q in queries]
+
+    def similarity_search(
+        self, query: str, k: int = 4, source: Optional[str] = None
+    ) -> List[Document]:
+        """Return the ``k`` chunks most similar to ``query``.
+
+        When ``source`` is given, only chunks of that document are searched.
+        """
+        if self.embeddings is None:
+            return self._similarity_search_in_memory(query, k, source)
+        return self.similarity_search_by_vector(
+            self.embed_queries([query])[0], k, source
+        )
+
+    def similarity_search_by_vector(
+        self, query_embedding: List[float], k: int = 4, source: Optional[str] = None
+    ) -> List[Document]:
+        """Return the ``k`` chunks closest to an already computed embedding."""
+        if not self.database_url:
+            return self._similarity_search_dense(query_embedding, k, source)
+        if self.cache is None:
+            self.cache = SemanticCache(dimension=len(query_embedding))
+        # Entries are (k, rows): immutable rows fetched for a limit of k.
+        cached = self.cache.get(query_embedding, namespace=source)
+        if cached is not None and cached[0] >= k:
+            rows = cached[1]
+        else:
+            params = (_vector_literal(query_embedding), k)
+            with self._connect() as conn:
+                if source is None:
+                    result = conn.execute(_NEAREST_SQL, params, prepare=True)
+                else:
+                    # Keep walking the graph until k rows pass the filter.
+                    conn.execute("SET LOCAL hnsw.iterative_scan = strict_order")
+                    result = conn.execute(
+                        _NEAREST_IN_SOURCE_SQL, (source, *params), prepare=True
+                    )
+                rows = tuple(result.fetchall())
+            self.cache.put(query_embedding, (k, rows), namespace=source)
+        return [
+            Document(
+                page_content=content,
+                metadata={"id": chunk_id, "source": source, "chunk_index": chunk_index},
+            )
+            for chunk_id, content, chunk_index, source in rows[:k]
+        ]
+
+    def _get_vectorizer(self):
+        if self.vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+
+            self.vectorizer = HashingVectorizer(
+                n_features=2**18, alternate_sign=False, norm="l2"
+            )
+        return self.vectorizer
+
+    def _add_dense(self, docs: List[Document]) -> None:
+        if not docs:
+            return
+        vectors = _normalize_rows(
+            np.asarray(
+                self.embeddings.embed_texts([d.page_content for d in docs]),
+                dtype=np.float32,
+            )
+        )
+        with self._lock:
+            end = self._size + len(vectors)
+            if self._dense is None or end > len(self._dense):
+                capacity = max(end, 2 * (0 if self._dense is None else len(self._dense)))
+                grown = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+                if self._dense is not None:
+                    grown[: self._size] = self._dense[: self._size]
+                self._dense = grown
+            self._dense[self._size : end] = vectors
+            self._append(docs)
+            self._size = end
+
+    def save(self, path: str) -> None:
+        """Write the in-memory index to directory ``path``.
+
+        Does nothing for a Postgres-backed store.
+        """
+        if self.database_url:
+            return
+        from scipy.sparse import save_npz
 
+        with self._lock:
+            chunks = {"texts": list(self._texts), "metadata": list(self._metadata)}
+            dense = None if self._dense is None else self._dense[: self._size]
+            matrix = self._matrix
+        os.makedirs(path, exist_ok=True)
+        # Each file is written beside its target and renamed over it, since
+        # ``dense`` may be memory-mapped from the file being replaced.
+        if dense is not None:
+            _write_atomic(os.path.join(path, "dense.npy"), lambda f: np.save(f, dense))
+        if matrix is not None:
+            _write_atomic(
+                os.path.join(path, "lexical.npz"), lambda f: save_npz(f, matrix)
+            )
+        # Written last: ``load`` ignores a directory without it.
+        _write_atomic(
+            os.path.join(path, "chunks.json"),
+            lambda f: f.write(json.dumps(chunks).encode()),
+        )
+
+    def load(self, path: str) -> None:
+        """Restore an index written by :meth:`save`.
+
+        Embeddings are memory-mapped, so workers loading the same directory
+        share its pages until they add documents. Nothing is loaded for a
+        Postgres-backed store, or when ``path`` holds no index for the
+        store's search mode.
+        """
+        chunks_path = os.path.join(path, "chunks.json")
+        if self.database_url or not os.path.exists(chunks_path):
+            return
+        with open(chunks_path) as f:
+            chunks = json.load(f)
+        if self.embeddings is not None:
+            dense_path = os.path.join(path, "dense.npy")
+            if not os.path.exists(dense_path):
+                return
+            dense = np.load(dense_path, mmap_mode="r")
+            if len(dense) != len(chunks["texts"]):
+                return
+            with self._lock:
+                self._dense, self._size = dense, len(dense)
+                self._texts, self._metadata = chunks["texts"], chunks["metadata"]
+            return
+        lexical_path = os.path.join(path, "lexical.npz")
+        if not os.path.exists(lexical_path):
+            return
+        from scipy.sparse import load_npz
+
+        matrix = load_npz(lexical_path).tocsr()
+        if matrix.shape[0] != len(chunks["texts"]):
+            return
+        self._get_vectorizer()
+        with self._lock:
+            self._matrix = matrix
+            self._texts, self._metadata = chunks["texts"], chunks["metadata"]
+
+    def _append(self, docs: List[Document]) -> None:
+        self._texts.extend(d.page_content for d in docs)
+        self._metadata.extend(d.metadata for d in docs)
+
+    def _document(self, i: int) -> Document:
+        return Document(page_content=self._texts[i], metadata=dict(self._metadata[i]))
+
+    def _rows_from(self, source: str, n_rows: int) -> np.ndarray:
+        """Return the indices of the first ``n_rows`` chunks from ``source``."""
+        return np.flatnonzero(
+            [meta.get("source") == source for meta in self._metadata[:n_rows]]
+        )
+
+    def _similarity_search_dense(
+        self, query_embedding: List[float], k: int, source: Optional[str] = None
+    ) -> List[Document]:
+        with self._lock:
+            matrix = None if self._dense is None else self._dense[: self._size]
+        if matrix is None or not len(matrix):
+            return []
+        query_vec = _normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        if source is None:
+            return [self._document(i) for i in _top_k(matrix @ query_vec, k)]
+        rows = self._rows_from(source, len(matrix))
+        scores = matrix[rows] @ query_vec
+        return [self._document(i) for i in rows[_top_k(scores, k)]]
+
+    def _similarity_search_in_memory(
+        self, query: str, k: int, source: Optional[str] = None
+    ) -> List[Document]:
+        if not self._texts:
+            return []
+        # Rows and query are L2-normalized, so the dot product is the cosine.
         query_vec = self.vectorizer.transform([query])
-        sims = cosine_similarity(query_vec, self._matrix).flatten()
-        indices = sims.argsort()[::-1][:k]
-        return [self.documents[i] for i in indices]
+        matrix = self._matrix
+        rows = None if source is None else self._rows_from(source, matrix.shape[0])
+        if rows is not None:
+            matrix = matrix[rows]
+        sims = np.asarray((matrix @ query_vec.T).todense()).ravel()
+        top = _top_k(sims, k)
+        return [self._document(i) for i in (top if rows is None else rows[top])]
+
+    def reindex(self, params: Optional[Dict[str, int]] = None) -> None:
+        """Rebuild the HNSW index with parameters sized to the stored vectors.
+
+        The replacement is built ``CONCURRENTLY`` and swapped in, so reads and
+        writes keep using the old index while the new one is built. Workers
+        sharing the database serialize on a Postgres advisory lock: the call
+        returns at once while another rebuild runs, and skips the rebuild
+        when the live index was already built with the target ``m``.
+        """
+        with self._connect(autocommit=True) as conn:
+            locked = conn.execute(
+                "SELECT pg_try_advisory_lock(%s)", (_REINDEX_LOCK_KEY,)
+            ).fetchone()[0]
+            if not locked:
+                return
+            try:
+                if params is None:
+                    params = hnsw_params(self._vector_count(conn))
+                if self._live_index_m(conn) != params["m"]:
+                    self._rebuild_index(conn, params)
+            finally:
+                conn.execute("SELECT pg_advisory_unlock(%s)", (_REINDEX_LOCK_KEY,))
+        self._adopt_index_m(params["m"])
+
+    @staticmethod
+    def _rebuild_index(conn: psycopg.Connection, params: Dict[str, int]) -> None:
+        conn.execute("SET maintenance_work_mem = '2GB'")
+        conn.execute("SET max_parallel_maintenance_workers = 7")
+        conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_INDEX_NAME}_new")
+        conn.execute(
+            f"CREATE INDEX CONCURRENTLY {_INDEX_NAME}_new ON document_chunks"
+            " USING hnsw (embedding halfvec_ip_ops)"
+            f" WITH (m = {params['m']}, ef_construction = {params['ef_construction']})"
+        )
+        conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_INDEX_NAME}")
+        conn.execute(f"ALTER INDEX {_INDEX_NAME}_new RENAME TO {_INDEX_NAME}")
 
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
+# Files from one upload request that are processed at the same time.
+MAX_CONCURRENT_UPLOADS = 4
+# Bytes read from the request body per write to the temporary file.
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 
 class QueryRequest(BaseModel):
     query: str
     k: Optional[int] = 4
+    source: Optional[str] = None
 
 
 def get_processor(request: Request) -> DocumentProcessor:
@@ -76,23 +700,42 @@ def get_store(request: Request) -> HybridVectorStore:
     return request.app.state.store
 
 
+def get_cpu_pool(request: Request) -> Optional[Executor]:
+    return getattr(request.app.state, "cpu_pool", None)
+
+
 @router.post("/upload")
 async def upload_documents(
     files: List[UploadFile] = File(...),
     processor: DocumentProcessor = Depends(get_processor),
     store: HybridVectorStore = Depends(get_store),
+    cpu_pool: Optional[Executor] = Depends(get_cpu_pool),
 ):
-    results = []
-    for file in files:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            data = await file.read()
-            tmp.write(data)
-            tmp_path = tmp.name
-        docs = processor.process(tmp_path)
-        store.add_documents(docs)
-        os.remove(tmp_path)
-        results.append({"filename": file.filename, "chunks": len(docs)})
-    return results
+    slots = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+
+    async def process_one(file: UploadFile) -> dict:
+        async with slots, aiofiles.tempfile.NamedTemporaryFile(
+            "wb", suffix=".pdf"
+        ) as tmp:
+            digest = hashlib.sha256()
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                await tmp.write(chunk)
+            await tmp.flush()
+            try:
+                docs = await asyncio.to_thread(
+                    processor.process,
+                    tmp.name,
+                    file.filename,
+                    digest.digest(),
+                    executor=cpu_pool,
+                )
+                await asyncio.to_thread(store.add_documents, docs)
+            except Exception as exc:
+                return {"filename": file.filename, "error": str(exc)}
+        return {"filename": file.filename, "chunks": len(docs)}
+
+    return await asyncio.gather(*(process_one(file) for file in files))
 
 
 @router.post("/query")
@@ -100,7 +743,9 @@ async def query_documents(
     request: QueryRequest,
     store: HybridVectorStore = Depends(get_store),
 ):
-    docs = store.similarity_search(request.query, request.k or 4)
+    docs = await asyncio.to_thread(
+        store.similarity_search, request.query, request.k or 4, request.source
+    )
     return [
         {"page_content": d.page_content, "metadata": d.metadata}
         for d in docs
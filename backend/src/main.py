@@ -1,27 +1,43 @@
 from __future__ import annotations
 
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
 from agent.app import create_frontend_router
-from api.documents import (
-    router as documents_router,
-    DocumentProcessor,
-    HybridVectorStore,
-    get_processor,
-    get_store,
-)
+from agent.rag_graph import get_vector_store
+from api.documents import router as documents_router, DocumentProcessor
 
 
 @asynccontextmanager
-def lifespan(app: FastAPI):
-    """Create shared resources for the application."""
-    processor = DocumentProcessor()
-    store = HybridVectorStore()
-    app.dependency_overrides[get_processor] = lambda: processor
-    app.dependency_overrides[get_store] = lambda: store
-    yield
+async def lifespan(app: FastAPI):
+    """Create shared resources for the application.
+
+    Without a database, the in-memory index is restored from and saved to
+    ``VECTOR_STORE_PATH`` when that variable is set.
+    """
+    # PDF text extraction holds the GIL, so it runs in worker processes.
+    # Spawned workers avoid forking a process that already runs threads.
+    app.state.cpu_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+    )
+    app.state.processor = DocumentProcessor()
+    app.state.store = get_vector_store()
+    store_path = os.getenv("VECTOR_STORE_PATH")
+    if store_path:
+        await asyncio.to_thread(app.state.store.load, store_path)
+    await asyncio.to_thread(app.state.store.open_pool)
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(app.state.store.close_pool)
+        if store_path:
+            await asyncio.to_thread(app.state.store.save, store_path)
+        await asyncio.to_thread(app.state.cpu_pool.shutdown)
 
 
 app = FastAPI(lifespan=lifespan)
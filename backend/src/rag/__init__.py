@@ -1,18 +1,20 @@
+"""Initialize the retrieval-augmented generation package."""
 
-"""RAG (Retrieval Augmented Generation) utilities."""
-
-
-"""RAG utilities."""
 from __future__ import annotations
 
-"""Initialize the retrieval-augmented generation package."""
+from typing import TYPE_CHECKING, Any
 
-from .document_processor import DocumentProcessor as DocumentProcessor
-from .document_processor import OCRRequiredError as OCRRequiredError
+if TYPE_CHECKING:
+    from .document_processor import DocumentProcessor as DocumentProcessor
+    from .document_processor import OCRRequiredError as OCRRequiredError
 
 __all__ = ["DocumentProcessor", "OCRRequiredError"]
 
 
-pass
+def __getattr__(name: str) -> Any:
+    """Import re-exported names on first access."""
+    if name in __all__:
+        from . import document_processor
 
- main
+        return getattr(document_processor, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,18 +1,53 @@
-
-"""Utility for turning PDF files into LangChain document chunks."""
-from __future__ import annotations
-
 """Process documents before indexing in the vector store."""
 
+from __future__ import annotations
 
+import io
 import os
+from concurrent.futures import Executor
+from itertools import repeat
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, List, Optional, Union
+
+from langchain_core.documents import Document
+
+# Pages handed to one extraction task; each task opens its own reader.
+PAGES_PER_TASK = 16
+
+
+def _open(pdf: Union[str, bytes]) -> Union[str, BinaryIO]:
+    return io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf
+
+
+def _extract_page_range(pdf: Union[str, bytes], start: int, stop: int) -> List[str]:
+    from pypdf import PdfReader
 
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from pdfminer.high_level import extract_text
+    reader = PdfReader(_open(pdf))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def extract_pages(
+    file_path: Union[str, bytes], executor: Optional[Executor] = None
+) -> List[str]:
+    """Return the text of every page.
+
+    ``file_path`` may also be the PDF's contents. Pass a process pool as
+    ``executor`` to extract page ranges in parallel outside this
+    interpreter's GIL; ``PdfReader`` is not safe to share between workers,
+    so each task opens the file separately. Without one, pages are
+    extracted in order by a single reader, since pypdf holds the GIL and
+    threads would only add the cost of parsing the file once per range.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(_open(file_path))
+    page_count = len(reader.pages)
+    if executor is None or page_count <= PAGES_PER_TASK:
+        return [page.extract_text() or "" for page in reader.pages]
+    starts = range(0, page_count, PAGES_PER_TASK)
+    stops = [min(start + PAGES_PER_TASK, page_count) for start in starts]
+    batches = executor.map(_extract_page_range, repeat(file_path), starts, stops)
+    return [text for batch in batches for text in batch]
 
 
 class OCRRequiredError(Exception):
@@ -37,10 +72,12 @@ class DocumentProcessor:
             else chunk_overlap
         )
 
-    def _ensure_text(self, file_path: str) -> None:
+    def _ensure_text(self, pdf: Union[str, bytes]) -> None:
         """Ensure the PDF contains extractable text."""
+        from pdfminer.high_level import extract_text
+
         try:
-            text = extract_text(file_path, maxpages=1)
+            text = extract_text(_open(pdf), maxpages=1)
         except Exception:
             text = ""
         if not text or not text.strip():
@@ -54,10 +91,21 @@ class DocumentProcessor:
         if not path.is_file():
             raise FileNotFoundError(str(path))
 
-        self._ensure_text(str(path))
+        return self._process(str(path), str(path))
 
-        loader = PyPDFLoader(str(path))
-        docs = loader.load()
+    def process_bytes(self, payload: bytes, source: str) -> List[Document]:
+        """Split a PDF already held in memory, naming it ``source``."""
+        return self._process(payload, source)
+
+    def _process(self, pdf: Union[str, bytes], source: str) -> List[Document]:
+        self._ensure_text(pdf)
+
+        docs = [
+            Document(page_content=text, metadata={"source": source, "page": i})
+            for i, text in enumerate(extract_pages(pdf))
+        ]
+
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
 
         splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
@@ -66,10 +114,6 @@ class DocumentProcessor:
         chunks = splitter.split_documents(docs)
 
         for i, doc in enumerate(chunks):
-            doc.metadata["source"] = str(path)
+            doc.metadata["source"] = source
             doc.metadata["chunk_index"] = i
         return chunks
-
-
-pass
- main
@@ -0,0 +1,78 @@
+"""Persist embeddings in a local SQLite file."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+
+
+class SqliteEmbeddingCache:
+    """``EmbeddingCache`` for processes that run without Postgres.
+
+    Vectors are stored as float32 blobs keyed by ``content_key``. Recently
+    used entries are also kept in memory, and the file is trimmed to its
+    ``capacity`` newest entries.
+    """
+
+    def __init__(
+        self, path: str, capacity: int = 100_000, memory_size: int = 4096
+    ) -> None:
+        """Open or create the cache file.
+
+        Args:
+            path: SQLite database file.
+            capacity: Maximum number of entries kept on disk.
+            memory_size: Maximum number of entries kept in memory.
+        """
+        self.capacity = capacity
+        self.memory_size = memory_size
+        self._memory: OrderedDict[bytes, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings"
+            " (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _remember(self, key: bytes, vector: list[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, list[float]]:
+        """Return the cached embeddings for whichever ``keys`` are present."""
+        with self._lock:
+            found = {key: self._memory[key] for key in keys if key in self._memory}
+            missing = [key for key in keys if key not in found]
+            for start in range(0, len(missing), 500):
+                part = missing[start : start + 500]
+                rows = self._conn.execute(
+                    "SELECT hash, vec FROM embeddings WHERE hash IN"
+                    f" ({', '.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            for key, vector in found.items():
+                self._remember(key, vector)
+        return found
+
+    def put_many(self, embeddings: dict[bytes, list[float]]) -> None:
+        """Store embeddings, keeping any existing entry for a key."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (hash, vec) VALUES (?, ?)",
+                [(key, array("f", v).tobytes()) for key, v in embeddings.items()],
+            )
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid <="
+                " (SELECT MAX(rowid) FROM embeddings) - ?",
+                (self.capacity,),
+            )
+            self._conn.commit()
+            for key, vector in embeddings.items():
+                self._remember(key, vector)
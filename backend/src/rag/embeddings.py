@@ -1,39 +1,144 @@
+"""Create and handle embeddings for documents."""
 
-"""Utilities for embedding models."""
+from __future__ import annotations
 
+import hashlib
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Protocol
 
-class ConfigError(Exception):
-    """Raised when environment configuration is invalid."""
+# Vertex AI rejects ``get_embeddings`` requests with more texts than this.
+MAX_BATCH_SIZE = 250
+# It also rejects requests whose texts total more input tokens than this.
+MAX_BATCH_TOKENS = 20_000
+# Characters per token assumed when sizing batches. English text averages
+# about four; three leaves room for text that tokenizes less densely.
+CHARS_PER_TOKEN = 3
+# Upper bound on embedding requests in flight per service, across all callers.
+MAX_CONCURRENT_REQUESTS = 8
 
-import os
-from __future__ import annotations
-#This may need to be updated REVIEWME
-"""Create and handle embeddings for documents."""
 
 class ConfigError(Exception):
     """Raised when required configuration is missing."""
 
 
+class EmbeddingCache(Protocol):
+    """Persistent store of embeddings keyed by ``content_key``."""
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, list[float]]:
+        """Return the cached embeddings for whichever ``keys`` are present."""
+        ...
+
+    def put_many(self, embeddings: dict[bytes, list[float]]) -> None:
+        """Store embeddings, keeping any existing entry for a key."""
+        ...
+
+
+def _unit(vector: list[float]) -> list[float]:
+    """Scale ``vector`` to unit length so inner product equals cosine."""
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+def content_key(model_name: str, text: str) -> bytes:
+    """Return the SHA-256 cache key for ``text`` embedded by ``model_name``."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode()).digest()
+
+
 class EmbeddingService:
     """Service for embedding text using Vertex AI."""
 
-    def __init__(self, model_name: str | None = None) -> None:
+    def __init__(
+        self, model_name: str | None = None, cache: EmbeddingCache | None = None
+    ) -> None:
         """Initialize the service.
 
         Args:
             model_name: Name of the Vertex AI embedding model. If ``None`` the
                 environment variable ``EMBEDDING_MODEL`` is used.
+            cache: Optional persistent cache consulted before calling Vertex AI.
         """
         self.model_name = model_name or os.environ.get("EMBEDDING_MODEL")
         if self.model_name is None:
             raise ConfigError("EMBEDDING_MODEL is not set")
+        self._model: Any = None
+        self._model_lock = threading.Lock()
+        self._requests = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self.cache = cache
+
+    def _get_model(self) -> Any:
+        """Return the Vertex AI model, initializing the SDK on first use."""
+        with self._model_lock:
+            if self._model is None:
+                project_id = os.environ.get("GCP_PROJECT_ID")
+                if not project_id or not self.model_name:
+                    raise ConfigError("Missing EMBEDDING_MODEL or GCP_PROJECT_ID")
+                import vertexai
+                from vertexai.language_models import TextEmbeddingModel
+
+                vertexai.init(
+                    project=project_id, location=os.environ.get("GCP_LOCATION")
+                )
+                self._model = TextEmbeddingModel.from_pretrained(self.model_name)
+            return self._model
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed one batch from ``_batches`` in one Vertex AI request."""
+        model = self._get_model()
+        with self._requests:
+            embeddings = model.get_embeddings(texts)
+        return [_unit(embedding.values) for embedding in embeddings]
+
+    @staticmethod
+    def _batches(texts: list[str]) -> list[list[str]]:
+        """Split ``texts`` into batches within both Vertex AI request limits.
+
+        Token counts are estimated from length; a text over the token budget
+        on its own is sent alone.
+        """
+        batches: list[list[str]] = []
+        batch: list[str] = []
+        tokens = 0
+        for text in texts:
+            cost = len(text) // CHARS_PER_TOKEN + 1
+            if batch and (
+                len(batch) == MAX_BATCH_SIZE or tokens + cost > MAX_BATCH_TOKENS
+            ):
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += cost
+        if batch:
+            batches.append(batch)
+        return batches
 
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
-        """Embed a batch of texts using Vertex AI."""
-        project_id = os.environ.get("GCP_PROJECT_ID")
-        if not project_id or not self.model_name:
-            raise ConfigError("Missing EMBEDDING_MODEL or GCP_PROJECT_ID")
-        raise NotImplementedError("Embedding call to Vertex AI not implemented")
+        """Embed texts, calling Vertex AI only for texts missing from the cache.
+
+        Returned embeddings have unit length.
+        """
+        if self.cache is None or not texts:
+            return self._embed_uncached(texts)
+        keys = [content_key(self.model_name, text) for text in texts]
+        found = self.cache.get_many(list(set(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            computed = dict(zip(missing, self._embed_uncached(list(missing.values()))))
+            self.cache.put_many(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def _embed_uncached(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts using Vertex AI, sending provider-sized batches concurrently."""
+        batches = self._batches(texts)
+        if len(batches) <= 1:
+            return self._embed_batch(texts) if texts else []
+        workers = min(len(batches), MAX_CONCURRENT_REQUESTS)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(self._embed_batch, batches))
+        return [vector for batch in results for vector in batch]
 
     @property
     def dimension(self) -> int | None:
@@ -43,9 +148,3 @@ class EmbeddingService:
         if self.model_name == "text-embedding-005":
             return 768
         return None
-
-
-
-
-pass
-main
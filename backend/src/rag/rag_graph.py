@@ -1,5 +1,305 @@
+"""Define the RAG graph for orchestrating retrieval and generation."""
+
 from __future__ import annotations
 
-"""Define the RAG graph for orchestrating retrieval and generation."""
+import functools
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple, TypedDict
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, START, StateGraph
+
+from .document_processor import DocumentProcessor
+
+if TYPE_CHECKING:
+    from api.documents import HybridVectorStore
+
+logger = logging.getLogger(__name__)
+
+# PDFs downloaded and split at the same time.
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "8"))
+# Chunks, possibly from several PDFs, indexed per ``add_documents`` call.
+INGEST_BATCH = int(os.getenv("RAG_INGEST_BATCH", "256"))
+# Directory for per-bucket ingest state kept between runs; unset keeps none.
+INGEST_STATE_DIR = os.getenv("RAG_INGEST_STATE_DIR")
+# Top-level prefixes of a bucket listed at the same time.
+LIST_WORKERS = int(os.getenv("RAG_LIST_WORKERS", "16"))
+# Server-side filter for PDF object names, in GCS ``matchGlob`` syntax.
+PDF_GLOB = "**.[pP][dD][fF]"
+# The same filter, for listings that cannot use ``PDF_GLOB``.
+_PDF_RE = re.compile(r"\.pdf\Z", re.IGNORECASE)
+# PDFs larger than this are skipped rather than downloaded.
+MAX_PDF_BYTES = int(os.getenv("RAG_MAX_PDF_MB", "100")) * 1024 * 1024
+# Object fields requested when listing; everything else is left out.
+_LIST_FIELDS = "items(name,size,generation),nextPageToken"
+
+
+class GcsIngestState(TypedDict, total=False):
+    """State for loading a GCS bucket into the document store."""
+
+    gcs_bucket_name: str
+    documents_loaded: int
+    error_messages: list[str]
+
+
+@functools.lru_cache(maxsize=4)
+def _get_storage_client(project_id: Optional[str]) -> Any:
+    """Return a storage client for ``project_id``, shared by later runs."""
+    from google.cloud import storage
+
+    return storage.Client(project=project_id)
+
+
+def _list_pdfs(client: Any, bucket: Any) -> List[Any]:
+    """Return the PDF blobs in ``bucket`` no larger than ``MAX_PDF_BYTES``.
+
+    One delimited listing finds the top-level prefixes, which are then
+    listed in parallel, each filtered to PDFs by GCS.
+    """
+    top = client.list_blobs(bucket, delimiter="/", fields=f"{_LIST_FIELDS},prefixes")
+    # The iterator fills ``prefixes`` as its pages are consumed. Objects at
+    # the top level come from the listing without a glob.
+    blobs = [blob for blob in top if _PDF_RE.search(blob.name)]
+
+    def list_prefix(prefix: str) -> List[Any]:
+        return list(
+            client.list_blobs(
+                bucket, prefix=prefix, match_glob=PDF_GLOB, fields=_LIST_FIELDS
+            )
+        )
+
+    with ThreadPoolExecutor(max_workers=LIST_WORKERS) as pool:
+        for part in pool.map(list_prefix, sorted(top.prefixes)):
+            blobs.extend(part)
+    pdfs = []
+    for blob in blobs:
+        if blob.size is not None and blob.size > MAX_PDF_BYTES:
+            logger.warning(
+                "Skipping gs://%s/%s: %d bytes is over RAG_MAX_PDF_MB",
+                bucket.name,
+                blob.name,
+                blob.size,
+            )
+        else:
+            pdfs.append(blob)
+    return pdfs
+
+
+def _chunk_hash(chunk: Document) -> bytes:
+    return hashlib.sha256(chunk.page_content.encode()).digest()
+
+
+def _read_hashes(path: Optional[str]) -> set[bytes]:
+    """Return the chunk hashes recorded at ``path`` by earlier runs."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, "rb") as f:
+        data = f.read()
+    return {data[i : i + 32] for i in range(0, len(data) - 31, 32)}
+
+
+def _append_hashes(path: Optional[str], hashes: List[bytes]) -> None:
+    if not path or not hashes:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "ab") as f:
+        f.write(b"".join(hashes))
+
+
+class _Manifest:
+    """Record which object generations earlier runs indexed, in SQLite.
+
+    GCS gives an object a new generation whenever its content changes, so a
+    recorded ``(bucket, name, generation)`` never needs invalidating.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed (bucket TEXT, name TEXT,"
+            " generation INTEGER, chunks INTEGER, ts REAL,"
+            " PRIMARY KEY (bucket, name, generation))"
+        )
+        self._conn.commit()
+
+    def processed(self, bucket: str) -> set[Tuple[str, int]]:
+        """Return the ``(name, generation)`` pairs recorded for ``bucket``."""
+        rows = self._conn.execute(
+            "SELECT name, generation FROM processed WHERE bucket = ?", (bucket,)
+        )
+        return set(rows)
+
+    def record(self, bucket: str, blobs: List[Tuple[str, int, int]]) -> None:
+        """Record ``(name, generation, chunks)`` rows for ``bucket``."""
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?)",
+            [(bucket, name, gen, chunks, now) for name, gen, chunks in blobs],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class _BatchWriter:
+    """Collect chunks from several PDFs and index them in fixed-size batches.
+
+    Chunks whose text was already queued, or indexed by an earlier run, are
+    dropped before they reach the embedder.
+    """
+
+    def __init__(
+        self,
+        store: HybridVectorStore,
+        batch_size: int,
+        seen: Optional[set[bytes]] = None,
+    ) -> None:
+        self.store = store
+        self.batch_size = batch_size
+        self.written = 0
+        self.errors: List[str] = []
+        # Sources with at least one chunk in a failed batch.
+        self.failed_sources: set[str] = set()
+        # Hashes of chunks indexed by this writer, in insertion order.
+        self.indexed: List[bytes] = []
+        self._seen = set() if seen is None else seen
+        self._pending: List[Document] = []
+        self._lock = threading.Lock()
+
+    def add(self, chunks: List[Document]) -> None:
+        """Queue new ``chunks``, indexing a batch once enough are pending."""
+        with self._lock:
+            for chunk in chunks:
+                digest = _chunk_hash(chunk)
+                if digest not in self._seen:
+                    self._seen.add(digest)
+                    self._pending.append(chunk)
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        self._write(batch)
+
+    def flush(self) -> None:
+        """Index whatever is still pending."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: List[Document]) -> None:
+        hashes = [_chunk_hash(chunk) for chunk in batch]
+        try:
+            self.store.add_documents(batch)
+        except Exception as exc:
+            sources = sorted({chunk.metadata["source"] for chunk in batch})
+            with self._lock:
+                self.errors.append(f"{', '.join(sources)}: {exc}")
+                self.failed_sources.update(sources)
+                self._seen.difference_update(hashes)
+            return
+        with self._lock:
+            self.written += len(batch)
+            self.indexed.extend(hashes)
+
+
+def _load_one(
+    bucket: Any, blob: Any, processor: DocumentProcessor
+) -> Tuple[List[Document], Optional[str]]:
+    """Download and split the listed generation of one PDF in memory.
+
+    Returns:
+        The chunks and an error message, if any.
+    """
+    uri = f"gs://{bucket.name}/{blob.name}"
+    try:
+        payload = bucket.blob(blob.name, generation=blob.generation).download_as_bytes()
+        chunks = processor.process_bytes(payload, uri)
+    except Exception as exc:
+        logger.debug("Failed to load %s", uri, exc_info=True)
+        return [], f"{uri}: {exc}"
+    logger.debug("Split %s into %d chunks", uri, len(chunks))
+    return chunks, None
+
+
+def rag_load_data_from_gcs(
+    state: GcsIngestState, config: RunnableConfig
+) -> GcsIngestState:
+    """Index every PDF in the bucket ``gcs_bucket_name``.
+
+    PDFs are downloaded and split by ``INGEST_WORKERS`` threads, and their
+    chunks are indexed in batches of ``INGEST_BATCH`` so that small PDFs
+    share embedding requests and transactions. Chunks with identical text
+    are indexed once. With ``RAG_INGEST_STATE_DIR`` set, that holds across
+    runs on the same bucket, and PDFs whose current generation was fully
+    indexed by an earlier run are not downloaded again. Failures are
+    reported in ``error_messages`` and do not stop the load.
+    """
+    from agent.rag_graph import get_vector_store
+
+    client = _get_storage_client(os.environ.get("GCP_PROJECT_ID"))
+    bucket = client.bucket(state["gcs_bucket_name"])
+    blobs = _list_pdfs(client, bucket)
+    hashes_path = None
+    manifest = None
+    if INGEST_STATE_DIR:
+        hashes_path = os.path.join(INGEST_STATE_DIR, f"{bucket.name}.chunks")
+        manifest = _Manifest(os.path.join(INGEST_STATE_DIR, "ingest_manifest.db"))
+        done = manifest.processed(bucket.name)
+        blobs = [blob for blob in blobs if (blob.name, blob.generation) not in done]
+    logger.info("Loading %d PDFs from gs://%s", len(blobs), bucket.name)
+    processor = DocumentProcessor()
+    writer = _BatchWriter(
+        get_vector_store(), INGEST_BATCH, _read_hashes(hashes_path)
+    )
+    errors = list(state.get("error_messages", []))
+    earlier = len(errors)
+    loaded: List[Tuple[Any, int]] = []
+
+    def load(blob: Any) -> Optional[str]:
+        chunks, error = _load_one(bucket, blob, processor)
+        writer.add(chunks)
+        if error is None:
+            loaded.append((blob, len(chunks)))
+        return error
+
+    with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+        errors.extend(error for error in pool.map(load, blobs) if error)
+    writer.flush()
+    _append_hashes(hashes_path, writer.indexed)
+    errors.extend(writer.errors)
+    if manifest is not None:
+        manifest.record(
+            bucket.name,
+            [
+                (blob.name, blob.generation, chunks)
+                for blob, chunks in loaded
+                if f"gs://{bucket.name}/{blob.name}" not in writer.failed_sources
+            ],
+        )
+        manifest.close()
+    logger.info(
+        "Indexed %d chunks from gs://%s with %d errors",
+        writer.written,
+        bucket.name,
+        len(errors) - earlier,
+    )
+    return {"documents_loaded": writer.written, "error_messages": errors}
+
 
-pass
+def create_ingest_graph():
+    """Return a graph that loads a GCS bucket into the document store."""
+    builder = StateGraph(GcsIngestState)
+    builder.add_node("rag_load_data_from_gcs", rag_load_data_from_gcs)
+    builder.add_edge(START, "rag_load_data_from_gcs")
+    builder.add_edge("rag_load_data_from_gcs", END)
+    return builder.compile(name="rag-ingest-graph")
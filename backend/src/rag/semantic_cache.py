@@ -0,0 +1,95 @@
+"""Cache retrieval results keyed by query embedding similarity."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Hashable, Sequence
+
+import numpy as np
+
+
+class SemanticCache:
+    """Similarity cache for retrieval results.
+
+    Query embeddings are bucketed with random-projection LSH: the key is the
+    sign pattern of ``W @ q`` for a fixed Gaussian matrix ``W``. A lookup only
+    scans its own bucket and returns a cached value whose query has cosine
+    similarity of at least ``threshold`` with the new one. Entries put under
+    a ``namespace`` are only returned for lookups in the same namespace.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        n_projections: int = 16,
+        threshold: float = 0.95,
+        ttl: float = 300.0,
+        bucket_size: int = 32,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            dimension: Size of the query embeddings.
+            n_projections: Number of random hyperplanes, i.e. key bits.
+            threshold: Minimum cosine similarity for a hit.
+            ttl: Seconds an entry stays valid.
+            bucket_size: Maximum entries kept per bucket; oldest are evicted.
+            seed: Seed for the projection matrix.
+        """
+        rng = np.random.default_rng(seed)
+        self._projections = rng.standard_normal((n_projections, dimension)).astype(
+            np.float32
+        )
+        self._bit_weights = 1 << np.arange(n_projections, dtype=np.int64)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.bucket_size = bucket_size
+        self._buckets: dict[
+            tuple[Hashable, int], list[tuple[np.ndarray, Any, float]]
+        ] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _key(self, vector: np.ndarray) -> int:
+        bits = (self._projections @ vector) > 0
+        return int(self._bit_weights[bits].sum())
+
+    def get(
+        self, embedding: Sequence[float], namespace: Hashable = None
+    ) -> Any | None:
+        """Return the value cached for a similar query, if any."""
+        vector = self._normalize(embedding)
+        key = (namespace, self._key(vector))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if not bucket:
+                return None
+            bucket[:] = [entry for entry in bucket if entry[2] > now]
+            for cached, value, _ in reversed(bucket):
+                if float(cached @ vector) >= self.threshold:
+                    return value
+        return None
+
+    def put(
+        self, embedding: Sequence[float], value: Any, namespace: Hashable = None
+    ) -> None:
+        """Cache ``value`` for the query ``embedding``."""
+        vector = self._normalize(embedding)
+        key = (namespace, self._key(vector))
+        with self._lock:
+            bucket = self._buckets.setdefault(key, [])
+            bucket.append((vector, value, time.monotonic() + self.ttl))
+            del bucket[: -self.bucket_size]
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._buckets.clear()
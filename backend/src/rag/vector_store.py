@@ -1,61 +1,159 @@
-
 """Hybrid vector store combining Chroma and PGVector."""
 
 from __future__ import annotations
 
+import hashlib
+import heapq
 import os
-from typing import List, Literal
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import Dict, List, Literal, Tuple
 
-from langchain_community.vectorstores import Chroma, PGVector
 from langchain_core.documents import Document
 
 from .embeddings import ConfigError
 
+# Cold-tier hits after which a chunk is copied into the hot store.
+HOT_PROMOTION_THRESHOLD = int(os.getenv("HOT_PROMOTION_THRESHOLD", "3"))
+# SQLAlchemy pool shared by every thread using one store's cold tier.
+COLD_POOL_ARGS = {"pool_size": 8, "max_overflow": 4, "pool_pre_ping": True}
+# Cosine distance in the hot tier, matching PGVector's default, so that
+# scores from both tiers can be ranked together.
+HOT_COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
+
+# Runs cold-tier queries alongside the hot-tier query on the caller's thread.
+_cold_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cold-search")
+
+
+def _content_hash(doc: Document) -> bytes:
+    return hashlib.sha256(doc.page_content.encode()).digest()
+
 
 class HybridVectorStore:
-    """Wrapper around two vector stores for hot and cold tiers."""
+    """Wrapper around two vector stores for hot and cold tiers.
+
+    Chunks served from the cold tier ``HOT_PROMOTION_THRESHOLD`` times are
+    copied into the hot tier in the background, so frequently retrieved
+    chunks stop costing a Postgres round trip. Both stores are opened on
+    first use, and setting ``CHROMA_PERSIST_DIR`` to an empty string
+    disables the hot tier.
+    """
 
     def __init__(self, embedding_function):
-        """Initialize the hot and cold vector stores."""
-        persist_dir = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
-        self._hot_store = Chroma(
-            persist_directory=persist_dir,
-            embedding_function=embedding_function,
-        )
-        database_url = os.getenv("DATABASE_URL")
-        self._cold_store = (
-            PGVector(connection_string=database_url, embedding_function=embedding_function)
-            if database_url
-            else None
-        )
+        """Read the configuration of both tiers without opening either."""
+        self._embedding_function = embedding_function
+        self._persist_dir = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
+        self._database_url = os.getenv("DATABASE_URL")
+        self._init_lock = threading.Lock()
+        self._hits: Counter = Counter()
+        self._hits_lock = threading.Lock()
+
+    @cached_property
+    def _hot_store(self):
+        """Return the Chroma store, opening it on first access."""
+        if not self._persist_dir:
+            return None
+        with self._init_lock:
+            if "_hot_store" in self.__dict__:
+                return self.__dict__["_hot_store"]
+            from langchain_community.vectorstores import Chroma
+
+            store = Chroma(
+                persist_directory=self._persist_dir,
+                embedding_function=self._embedding_function,
+                collection_metadata=HOT_COLLECTION_METADATA,
+            )
+            self.__dict__["_hot_store"] = store
+            return store
+
+    @cached_property
+    def _cold_store(self):
+        """Return the PGVector store, creating it on first access."""
+        if not self._database_url:
+            return None
+        with self._init_lock:
+            # Another thread may have created it while this one waited.
+            if "_cold_store" in self.__dict__:
+                return self.__dict__["_cold_store"]
+            from langchain_community.vectorstores import PGVector
+
+            store = PGVector(
+                connection_string=self._database_url,
+                embedding_function=self._embedding_function,
+                engine_args=COLD_POOL_ARGS,
+            )
+            self.__dict__["_cold_store"] = store
+            return store
 
     def add_documents(
         self, docs: List[Document], tier: Literal["hot", "cold"] = "hot"
     ) -> None:
         """Add documents to one of the stores."""
         if tier == "hot":
+            if self._hot_store is None:
+                raise ConfigError("CHROMA_PERSIST_DIR is empty")
             self._hot_store.add_documents(docs)
         else:
-            if self._cold_store is None:
+            if not self._database_url:
                 raise ConfigError("DATABASE_URL is not configured")
             self._cold_store.add_documents(docs)
 
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        """Search the hot store first, then cold store if needed."""
-        results = self._hot_store.similarity_search(query, k=k)
-        if len(results) >= k:
-            return results[:k]
-        remaining = k - len(results)
-        if self._cold_store is None:
-            return results
-        cold_results = self._cold_store.similarity_search(query, k=remaining)
-        return results + cold_results
+    def record_hit(self, doc: Document) -> bool:
+        """Count a cold-tier hit for ``doc``.
 
-    def persist(self) -> None:
-        """Persist the hot store."""
-        self._hot_store.persist()
+        Returns:
+            Whether this hit reached the promotion threshold.
+        """
+        key = _content_hash(doc)
+        with self._hits_lock:
+            self._hits[key] += 1
+            return self._hits[key] == HOT_PROMOTION_THRESHOLD
 
+    def _promote(self, docs: List[Document]) -> None:
+        """Copy ``docs`` into the hot store on a background thread."""
+        threading.Thread(
+            target=self._hot_store.add_documents, args=(docs,), daemon=True
+        ).start()
 
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        """Return the ``k`` chunks nearest to ``query`` across both stores.
 
-pass
- main
+        The query is embedded once and both stores search by that vector at
+        the same time, so a search costs ``max(hot, cold)`` rather than
+        ``hot + cold``. Results are ranked together by cosine distance.
+        """
+        query_vector = self._embedding_function.embed_query(query)
+        if self._hot_store is None:
+            if not self._database_url:
+                raise ConfigError("Neither CHROMA_PERSIST_DIR nor DATABASE_URL is set")
+            return self._cold_store.similarity_search_by_vector(query_vector, k=k)
+        if not self._database_url:
+            return self._hot_store.similarity_search_by_vector(query_vector, k=k)[:k]
+        cold_future = _cold_search_pool.submit(
+            self._cold_store.similarity_search_with_score_by_vector, query_vector, k=k
+        )
+        hot = self._hot_store.similarity_search_by_vector_with_relevance_scores(
+            query_vector, k=k
+        )
+        # Promoted chunks stay in the cold store, so each chunk is kept once,
+        # at its best distance; a tie goes to the hot copy.
+        candidates: Dict[bytes, Tuple[Document, float, bool]] = {}
+        for is_cold, pairs in ((False, hot), (True, cold_future.result())):
+            for doc, distance in pairs:
+                key = _content_hash(doc)
+                if key not in candidates or distance < candidates[key][1]:
+                    candidates[key] = (doc, distance, is_cold)
+        top = heapq.nsmallest(k, candidates.values(), key=lambda c: c[1])
+        promoted = [doc for doc, _, is_cold in top if is_cold and self.record_hit(doc)]
+        if promoted:
+            self._promote(promoted)
+        return [doc for doc, _, _ in top]
+
+    def persist(self) -> None:
+        """Persist the hot store, if it was opened."""
+        hot = self.__dict__.get("_hot_store")
+        if hot is not None:
+            hot.persist()
@@ -0,0 +1,116 @@
+from pypdf import PdfWriter
+from pypdf.generic import (
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+)
+
+from api.documents import DocumentProcessor as UploadProcessor
+from rag import document_processor
+from rag.document_processor import DocumentProcessor, extract_pages
+
+
+def write_pdf(path, pages):
+    writer = PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    for text in pages:
+        page = writer.add_blank_page(width=612, height=792)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {
+                NameObject("/Font"): DictionaryObject(
+                    {NameObject("/F1"): writer._add_object(font)}
+                )
+            }
+        )
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_extract_pages_without_executor_reads_serially(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_processor, "PAGES_PER_TASK", 3)
+    monkeypatch.setattr(document_processor, "_extract_page_range", None)
+    path = write_pdf(tmp_path / "doc.pdf", [f"page number {i}" for i in range(10)])
+    texts = extract_pages(path)
+    assert [t.strip() for t in texts] == [f"page number {i}" for i in range(10)]
+
+
+def test_rag_processor_splits_every_page_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_processor, "PAGES_PER_TASK", 2)
+    path = write_pdf(tmp_path / "doc.pdf", [f"content of page {i}" for i in range(5)])
+    chunks = DocumentProcessor(chunk_size=50, chunk_overlap=0).process(path)
+    assert [c.metadata["page"] for c in chunks] == list(range(5))
+    assert [c.metadata["chunk_index"] for c in chunks] == list(range(5))
+    assert chunks[3].page_content.strip() == "content of page 3"
+
+
+def test_upload_processor_uses_given_source(tmp_path):
+    path = write_pdf(tmp_path / "tmp123.pdf", ["hello", "world"])
+    chunks = UploadProcessor().process(path, source="report.pdf")
+    assert [c.metadata for c in chunks] == [
+        {"page": 1, "source": "report.pdf"},
+        {"page": 2, "source": "report.pdf"},
+    ]
+
+
+def test_upload_processor_reuses_results_for_identical_files(tmp_path, monkeypatch):
+    from api import documents
+
+    calls = []
+    extract = documents.extract_pages
+    monkeypatch.setattr(
+        documents,
+        "extract_pages",
+        lambda path, executor=None: calls.append(path) or extract(path),
+    )
+    processor = UploadProcessor(chunk_size=50, chunk_overlap=0)
+    first = write_pdf(tmp_path / "a.pdf", ["same content"])
+    second = write_pdf(tmp_path / "b.pdf", ["same content"])
+    a = processor.process(first, "a.pdf")
+    b = processor.process(second, "b.pdf")
+    assert calls == [first]
+    assert [d.page_content for d in a] == [d.page_content for d in b]
+    assert {d.metadata["source"] for d in a} == {"a.pdf"}
+    assert {d.metadata["source"] for d in b} == {"b.pdf"}
+
+
+def test_upload_processor_cache_is_bounded(tmp_path):
+    processor = UploadProcessor(cache_size=2)
+    for i in range(3):
+        processor.process(write_pdf(tmp_path / f"{i}.pdf", [f"file {i}"]))
+    assert len(processor._cache) == 2
+
+
+def test_extract_pages_runs_on_process_pool(tmp_path, monkeypatch):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    monkeypatch.setattr(document_processor, "PAGES_PER_TASK", 2)
+    path = write_pdf(tmp_path / "doc.pdf", [f"page number {i}" for i in range(5)])
+    with ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        texts = extract_pages(path, pool)
+    assert [t.strip() for t in texts] == [f"page number {i}" for i in range(5)]
+
+
+def test_rag_processor_splits_pdf_bytes(tmp_path):
+    path = write_pdf(tmp_path / "doc.pdf", ["first page", "second page"])
+    with open(path, "rb") as f:
+        payload = f.read()
+    processor = DocumentProcessor(chunk_size=50, chunk_overlap=0)
+    chunks = processor.process_bytes(payload, "gs://bucket/doc.pdf")
+    assert [c.page_content.strip() for c in chunks] == ["first page", "second page"]
+    assert {c.metadata["source"] for c in chunks} == {"gs://bucket/doc.pdf"}
+    assert [c.page_content for c in processor.process(path)] == [
+        c.page_content for c in chunks
+    ]
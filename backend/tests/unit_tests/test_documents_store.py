@@ -0,0 +1,519 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from api.documents import (
+    HNSW_EF_SEARCH,
+    HybridVectorStore,
+    _ef_search_for_m,
+    _parse_vector,
+    _pg_dsn,
+    _top_k,
+    _vector_literal,
+    hnsw_params,
+)
+from rag.embeddings import ConfigError
+
+
+def test_pg_dsn_strips_sqlalchemy_driver():
+    assert _pg_dsn("postgresql+psycopg2://u:p@h:5432/db") == "postgresql://u:p@h:5432/db"
+    assert _pg_dsn("postgresql://u:p@h/db") == "postgresql://u:p@h/db"
+
+
+def test_vector_literal():
+    assert _vector_literal([0.5, -1, 2.25]) == "[0.5,-1,2.25]"
+
+
+def test_parse_vector_round_trips_literal():
+    assert _parse_vector(_vector_literal([0.5, -1.0, 2.25])) == [0.5, -1.0, 2.25]
+
+
+def test_hnsw_params_never_below_migration_defaults():
+    small = hnsw_params(0)
+    assert small == {"m": 24, "ef_construction": 128, "ef_search": 100}
+    assert hnsw_params(999_999) == small
+    assert HNSW_EF_SEARCH == 100
+
+
+def test_hnsw_params_grow_with_corpus():
+    medium, large = hnsw_params(1_000_000), hnsw_params(50_000_000)
+    assert medium["m"] > 24 and large["m"] > medium["m"]
+    assert large["ef_search"] > medium["ef_search"] > 100
+
+
+def test_ef_search_derived_from_index_m():
+    for n in (0, 1_000_000, 50_000_000):
+        params = hnsw_params(n)
+        assert _ef_search_for_m(params["m"]) == params["ef_search"]
+    assert _ef_search_for_m(16) == HNSW_EF_SEARCH
+
+
+def test_in_memory_fallback_ranks_by_similarity(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    store = HybridVectorStore()
+    assert store.similarity_search("anything") == []
+    store.add_documents(
+        [
+            Document(page_content="postgres vector index", metadata={"id": 1}),
+            Document(page_content="baking sourdough bread", metadata={"id": 2}),
+        ]
+    )
+    store.add_documents(
+        [Document(page_content="hnsw vector search in postgres", metadata={"id": 3})]
+    )
+    results = store.similarity_search("postgres vector", k=2)
+    assert {d.metadata["id"] for d in results} == {1, 3}
+    assert store.similarity_search("sourdough", k=1)[0].metadata["id"] == 2
+
+
+class KeywordEmbeddings:
+    """Embed text as counts of a few fixed keywords."""
+
+    model_name = "keywords"
+    dimension = None
+    keywords = ("postgres", "vector", "bread", "oven")
+
+    def embed_texts(self, texts):
+        return [[text.count(word) for word in self.keywords] for text in texts]
+
+
+def test_top_k_returns_best_first():
+    scores = np.array([0.1, 0.9, 0.3, 0.7, 0.5], dtype=np.float32)
+    assert _top_k(scores, 3).tolist() == [1, 3, 4]
+    assert _top_k(scores, 10).tolist() == [1, 3, 4, 2, 0]
+    assert _top_k(scores[:0], 3).tolist() == []
+
+
+def test_dense_fallback_ranks_by_cosine(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    store = HybridVectorStore(embeddings=KeywordEmbeddings())
+    store.add_documents(
+        [
+            Document(page_content="postgres vector vector", metadata={"id": 1}),
+            Document(page_content="bread oven", metadata={"id": 2}),
+        ]
+    )
+    store.add_documents([Document(page_content="bread", metadata={"id": 3})])
+    assert store._dense.dtype == np.float32
+    assert store._size == 3
+    assert store._dense.shape == (4, 4)
+    results = store.similarity_search("bread in the oven", k=2)
+    assert [d.metadata["id"] for d in results] == [2, 3]
+
+
+def test_dense_buffer_grows_without_losing_rows(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    store = HybridVectorStore(embeddings=KeywordEmbeddings())
+    for i in range(9):
+        store.add_documents([Document(page_content="oven", metadata={"id": i})])
+    assert store._size == 9
+    assert len(store._dense) == 16
+    assert np.allclose(store._dense[:9], [0, 0, 0, 1])
+    results = store.similarity_search("oven", k=9)
+    assert sorted(d.metadata["id"] for d in results) == list(range(9))
+    results[0].metadata["id"] = "mutated"
+    assert "mutated" not in {d.metadata["id"] for d in store.similarity_search("oven", k=9)}
+
+
+def test_lexical_inserts_do_not_refit_existing_rows(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    store = HybridVectorStore()
+    store.add_documents([Document(page_content="alpha beta")])
+    first_row = store._matrix[0].toarray()
+    store.add_documents([Document(page_content="gamma delta epsilon")])
+    assert store._matrix.shape[0] == 2
+    assert (store._matrix[0].toarray() == first_row).all()
+
+
+class StubEmbeddings:
+    dimension = 768
+
+
+class FakePool:
+    def __init__(self):
+        self.borrowed = 0
+        self.drained = 0
+
+    def connection(self):
+        self.borrowed += 1
+        return "pooled"
+
+    def drain(self):
+        self.drained += 1
+
+
+def test_connect_borrows_from_pool_except_for_autocommit(monkeypatch):
+    import psycopg
+
+    class FakeConnection:
+        def execute(self, *args, **kwargs):
+            return self
+
+        def fetchone(self):
+            return None
+
+        def commit(self):
+            pass
+
+    monkeypatch.setattr(psycopg, "connect", lambda *a, **kw: FakeConnection())
+    monkeypatch.setattr(
+        HybridVectorStore, "_configure_connection", lambda self, conn: None
+    )
+    store = HybridVectorStore(database_url="postgresql://db", embeddings=StubEmbeddings())
+    store._pool = FakePool()
+    assert store._connect() == "pooled"
+    assert isinstance(store._connect(autocommit=True), FakeConnection)
+    assert store._pool.borrowed == 1
+
+
+class ReindexConnection:
+    """Catalog with one HNSW index and an advisory lock shared by workers."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        if "pg_try_advisory_lock" in sql:
+            acquired = not self.catalog["locked"]
+            self.catalog["locked"] = True
+            return FakeResult([(acquired,)])
+        if "pg_advisory_unlock" in sql:
+            self.catalog["locked"] = False
+        elif "reloptions" in sql:
+            return FakeResult([([f"m={self.catalog['m']}"],)])
+        elif "reltuples" in sql:
+            return FakeResult([(self.catalog["rows"],)])
+        elif sql.startswith("CREATE INDEX"):
+            self.catalog["m"] = int(sql.split("m = ")[1].split(",")[0])
+        return FakeResult([])
+
+
+def reindex_store(catalog):
+    store = HybridVectorStore(database_url="postgresql://db", embeddings=StubEmbeddings())
+    store._pool = FakePool()
+    store._index_m = 24
+    conns = []
+
+    def connect(autocommit=False):
+        conns.append(ReindexConnection(catalog))
+        return conns[-1]
+
+    store._connect = connect
+    return store, conns
+
+
+def test_reindex_drains_pool():
+    catalog = {"m": 24, "rows": 0, "locked": False}
+    store, conns = reindex_store(catalog)
+    store.reindex(hnsw_params(20_000_000))
+    assert store._pool.drained == 1
+    assert store.ef_search == 400
+    assert catalog == {"m": 48, "rows": 0, "locked": False}
+
+
+def test_reindex_skips_while_another_worker_holds_the_lock():
+    catalog = {"m": 24, "rows": 0, "locked": True}
+    store, conns = reindex_store(catalog)
+    store.reindex(hnsw_params(20_000_000))
+    assert catalog["m"] == 24 and catalog["locked"]
+    assert not any(sql.startswith("CREATE") for sql in conns[0].statements)
+
+
+def test_reindex_skips_index_another_worker_already_rebuilt():
+    catalog = {"m": 48, "rows": 20_000_000, "locked": False}
+    store, conns = reindex_store(catalog)
+    store.reindex()
+    assert not any(sql.startswith("CREATE") for sql in conns[0].statements)
+    assert store._index_m == 48 and store.ef_search == 400
+
+
+def test_maybe_reindex_reads_live_index_m(monkeypatch):
+    catalog = {"m": 48, "rows": 20_000_000, "locked": False}
+    store, _ = reindex_store(catalog)
+    started = []
+    monkeypatch.setattr(
+        threading, "Thread", lambda **kwargs: started.append(kwargs) or None
+    )
+    store._maybe_reindex()
+    assert started == []
+    assert store._index_m == 48 and store.ef_search == 400
+    assert store._pool.drained == 1
+
+
+def test_lexical_search_returns_best_first(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    store = HybridVectorStore()
+    store.add_documents(
+        [
+            Document(page_content="oven", metadata={"id": 1}),
+            Document(page_content="bread oven oven", metadata={"id": 2}),
+            Document(page_content="bread flour", metadata={"id": 3}),
+        ]
+    )
+    results = store.similarity_search("bread oven", k=5)
+    assert [d.metadata["id"] for d in results] == [2, 1, 3]
+
+
+def test_dense_index_survives_save_and_load(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    store = HybridVectorStore(embeddings=KeywordEmbeddings())
+    store.add_documents(
+        [
+            Document(page_content="postgres vector", metadata={"id": 1}),
+            Document(page_content="bread oven", metadata={"id": 2}),
+        ]
+    )
+    store.save(str(tmp_path))
+    restored = HybridVectorStore(embeddings=KeywordEmbeddings())
+    restored.load(str(tmp_path))
+    assert restored.similarity_search("oven", k=1)[0].metadata["id"] == 2
+    restored.add_documents([Document(page_content="oven", metadata={"id": 3})])
+    assert [d.metadata["id"] for d in restored.similarity_search("oven", k=2)] == [3, 2]
+
+
+def test_memory_mapped_index_can_be_saved_over(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    store = HybridVectorStore(embeddings=KeywordEmbeddings())
+    store.add_documents(
+        [Document(page_content=f"bread {i}", metadata={"id": i}) for i in range(500)]
+    )
+    store.save(str(tmp_path))
+    restored = HybridVectorStore(embeddings=KeywordEmbeddings())
+    restored.load(str(tmp_path))
+    restored.save(str(tmp_path))
+    again = HybridVectorStore(embeddings=KeywordEmbeddings())
+    again.load(str(tmp_path))
+    assert again._size == 500
+    assert np.array_equal(again._dense, store._dense[:500])
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_lexical_index_survives_save_and_load(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    store = HybridVectorStore()
+    store.add_documents([Document(page_content="sourdough bread", metadata={"id": 1})])
+    store.save(str(tmp_path))
+    restored = HybridVectorStore()
+    restored.load(str(tmp_path))
+    assert restored.similarity_search("sourdough", k=1)[0].metadata["id"] == 1
+
+
+def test_load_ignores_missing_or_mismatched_index(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    store = HybridVectorStore()
+    store.load(str(tmp_path))
+    assert store.similarity_search("anything") == []
+    store.add_documents([Document(page_content="lexical only")])
+    store.save(str(tmp_path))
+    dense = HybridVectorStore(embeddings=KeywordEmbeddings())
+    dense.load(str(tmp_path))
+    assert dense.similarity_search("lexical") == []
+
+
+def test_in_memory_search_filters_by_source(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    docs = [
+        Document(page_content="bread oven", metadata={"id": 1, "source": "a.pdf"}),
+        Document(page_content="bread", metadata={"id": 2, "source": "b.pdf"}),
+        Document(page_content="oven", metadata={"id": 3, "source": "b.pdf"}),
+    ]
+    for store in (HybridVectorStore(), HybridVectorStore(embeddings=KeywordEmbeddings())):
+        store.add_documents(docs)
+        results = store.similarity_search("bread oven", k=5, source="b.pdf")
+        assert {d.metadata["id"] for d in results} == {2, 3}
+        assert store.similarity_search("bread oven", k=1)[0].metadata["id"] == 1
+        assert store.similarity_search("bread", source="missing.pdf") == []
+
+
+def test_query_embeddings_are_reused(monkeypatch):
+    from api import documents
+
+    class CountingEmbeddings(KeywordEmbeddings):
+        def __init__(self):
+            self.calls = []
+
+        def embed_texts(self, texts):
+            self.calls.append(list(texts))
+            return super().embed_texts(texts)
+
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setattr(documents, "QUERY_EMBEDDING_CACHE_SIZE", 2)
+    embeddings = CountingEmbeddings()
+    store = HybridVectorStore(embeddings=embeddings)
+    assert store.embed_queries(["oven", "bread", "oven"]) == [
+        [0, 0, 0, 1],
+        [0, 0, 1, 0],
+        [0, 0, 0, 1],
+    ]
+    store.embed_queries(["bread", "vector"])
+    store.embed_queries(["oven"])
+    assert embeddings.calls == [["oven", "bread"], ["vector"], ["oven"]]
+
+
+def unit(seed, dim):
+    vector = np.random.default_rng(seed).standard_normal(dim)
+    return vector / np.linalg.norm(vector)
+
+
+class FakeEmbeddings:
+    model_name = "fake"
+    dimension = 768
+
+    def embed_texts(self, texts):
+        return [list(unit(len(text), 768)) for text in texts]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.searches = 0
+        self.statements = []
+        self.copied = []
+        self.types = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None, prepare=None):
+        self.statements.append((sql, params))
+        if "INSERT INTO documents" in sql:
+            return FakeResult([(source, i) for i, source in enumerate(params[0])])
+        if "reltuples" in sql:
+            return FakeResult([(0,)])
+        if "reloptions" in sql:
+            return FakeResult([(["m=24"],)])
+        if "ORDER BY" in sql:
+            self.searches += 1
+            return FakeResult([(7, "chunk text", 0, "doc.pdf")])
+        return FakeResult([])
+
+    def cursor(self):
+        return self
+
+    def copy(self, sql):
+        return self
+
+    def set_types(self, types):
+        self.types = types
+
+    def write_row(self, row):
+        self.copied.append(row)
+
+
+@pytest.fixture
+def pg_store():
+    store = HybridVectorStore(database_url="postgresql://db", embeddings=FakeEmbeddings())
+    conn = FakeConnection()
+    store._connect = lambda autocommit=False: conn
+    store._index_m = 24
+    return store, conn
+
+
+def test_store_serves_repeat_queries_from_cache(pg_store):
+    store, conn = pg_store
+    first = store.similarity_search("what is hnsw", k=1)
+    second = store.similarity_search("what is hnsw", k=1)
+    assert conn.searches == 1
+    assert first[0].metadata == {"id": 7, "source": "doc.pdf", "chunk_index": 0}
+    second[0].page_content = "mutated"
+    second[0].metadata["source"] = "mutated"
+    third = store.similarity_search("what is hnsw", k=1)
+    assert third[0].page_content == "chunk text"
+    assert third[0].metadata["source"] == "doc.pdf"
+
+
+def test_store_refetches_for_larger_k(pg_store):
+    store, conn = pg_store
+    store.similarity_search("what is hnsw", k=1)
+    store.similarity_search("what is hnsw", k=4)
+    assert conn.searches == 2
+
+
+def test_add_documents_clears_cache(pg_store):
+    store, conn = pg_store
+    store.similarity_search("what is hnsw", k=1)
+    store.add_documents([Document(page_content="new", metadata={"source": "b.pdf"})])
+    store.similarity_search("what is hnsw", k=1)
+    assert conn.searches == 2
+
+
+def test_search_during_insert_is_not_cached_past_commit(pg_store):
+    store, conn = pg_store
+    embed = store.embeddings.embed_texts
+
+    def embed_during_search(texts):
+        if texts == ["new"]:
+            store.similarity_search("what is hnsw", k=1)
+        return embed(texts)
+
+    store.embeddings.embed_texts = embed_during_search
+    store.add_documents([Document(page_content="new", metadata={"source": "b.pdf"})])
+    store.similarity_search("what is hnsw", k=1)
+    assert conn.searches == 2
+
+
+def test_add_documents_copies_binary_halfvec_rows(pg_store):
+    from pgvector import HalfVector
+
+    store, conn = pg_store
+    store.add_documents(
+        [
+            Document(page_content="a0", metadata={"source": "a.pdf"}),
+            Document(page_content="b0", metadata={"source": "b.pdf"}),
+            Document(page_content="a1", metadata={"source": "a.pdf"}),
+        ]
+    )
+    assert conn.types == ["int8", "int4", "text", "text", "halfvec"]
+    by_content = {row[2]: row for row in conn.copied}
+    assert by_content["a0"][0] == by_content["a1"][0] != by_content["b0"][0]
+    assert [by_content[c][1] for c in ("a0", "a1", "b0")] == [0, 1, 0]
+    assert [by_content[c][3] for c in ("a0", "a1", "b0")] == ["a.pdf", "a.pdf", "b.pdf"]
+    assert all(isinstance(row[4], HalfVector) for row in conn.copied)
+
+
+def test_source_filter_uses_iterative_scan_and_own_cache_entries(pg_store):
+    store, conn = pg_store
+    store.similarity_search("what is hnsw", k=1)
+    store.similarity_search("what is hnsw", k=1, source="doc.pdf")
+    store.similarity_search("what is hnsw", k=1, source="doc.pdf")
+    assert conn.searches == 2
+    filtered = [p for sql, p in conn.statements if "WHERE source" in sql]
+    assert len(filtered) == 1 and filtered[0][0] == "doc.pdf"
+    assert any("iterative_scan" in sql for sql, _ in conn.statements)
+
+
+def test_store_rejects_mismatched_embedding_width():
+    embeddings = FakeEmbeddings()
+    embeddings.dimension = 3072
+    with pytest.raises(ConfigError):
+        HybridVectorStore(database_url="postgresql://db", embeddings=embeddings)
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from api import documents
+from api.documents import router
+
+
+class FakeProcessor:
+    def __init__(self):
+        self.paths = []
+
+    def process(self, file_path, source=None, content_hash=None, executor=None):
+        self.paths.append(file_path)
+        with open(file_path, "rb") as f:
+            data = f.read()
+        if data == b"broken":
+            raise ValueError("not a pdf")
+        return [Document(page_content=data.decode(), metadata={"source": source})]
+
+
+class FakeStore:
+    def __init__(self):
+        self.docs = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def add_documents(self, docs):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight -= 1
+            self.docs.extend(docs)
+
+
+def make_client(processor, store):
+    app = FastAPI()
+    app.include_router(router)
+    app.state.processor = processor
+    app.state.store = store
+    return TestClient(app)
+
+
+def test_upload_processes_files_concurrently_and_bounded():
+    processor, store = FakeProcessor(), FakeStore()
+    files = [
+        ("files", (f"doc{i}.pdf", f"text {i}".encode(), "application/pdf"))
+        for i in range(8)
+    ]
+    response = make_client(processor, store).post(
+        "/api/documents/upload", files=files
+    )
+    assert response.status_code == 200
+    assert [r["filename"] for r in response.json()] == [f"doc{i}.pdf" for i in range(8)]
+    assert 1 < store.max_in_flight <= documents.MAX_CONCURRENT_UPLOADS
+    assert {d.metadata["source"] for d in store.docs} == {
+        f"doc{i}.pdf" for i in range(8)
+    }
+
+
+def test_upload_reports_failed_file_and_cleans_up():
+    processor, store = FakeProcessor(), FakeStore()
+    files = [
+        ("files", ("good.pdf", b"good", "application/pdf")),
+        ("files", ("bad.pdf", b"broken", "application/pdf")),
+    ]
+    response = make_client(processor, store).post(
+        "/api/documents/upload", files=files
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"filename": "good.pdf", "chunks": 1},
+        {"filename": "bad.pdf", "error": "not a pdf"},
+    ]
+    assert not any(os.path.exists(path) for path in processor.paths)
+
+
+def test_upload_streams_large_file_in_chunks(monkeypatch):
+    monkeypatch.setattr(documents, "UPLOAD_CHUNK_SIZE", 1024)
+    processor, store = FakeProcessor(), FakeStore()
+    payload = b"x" * 10_000
+    response = make_client(processor, store).post(
+        "/api/documents/upload",
+        files=[("files", ("big.pdf", payload, "application/pdf"))],
+    )
+    assert response.json() == [{"filename": "big.pdf", "chunks": 1}]
+    assert store.docs[0].page_content == payload.decode()
+    assert not any(os.path.exists(path) for path in processor.paths)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from rag.embedding_cache import SqliteEmbeddingCache
+from rag.embeddings import EmbeddingService, content_key
+
+
+def key(i):
+    return content_key("model", str(i))
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SqliteEmbeddingCache(path).put_many({key(1): [0.5, -0.25], key(2): [1.0, 0.0]})
+    found = SqliteEmbeddingCache(path).get_many([key(1), key(3)])
+    assert found == {key(1): [0.5, -0.25]}
+
+
+def test_existing_entries_are_kept(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SqliteEmbeddingCache(path).put_many({key(1): [1.0]})
+    SqliteEmbeddingCache(path).put_many({key(1): [2.0]})
+    assert SqliteEmbeddingCache(path).get_many([key(1)]) == {key(1): [1.0]}
+
+
+def test_file_is_trimmed_to_capacity(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SqliteEmbeddingCache(path, capacity=3)
+    for i in range(5):
+        cache.put_many({key(i): [float(i)]})
+    found = SqliteEmbeddingCache(path).get_many([key(i) for i in range(5)])
+    assert sorted(found) == sorted(key(i) for i in (2, 3, 4))
+
+
+def test_service_embeds_only_misses(tmp_path):
+    class Model:
+        def __init__(self):
+            self.calls = []
+
+        def get_embeddings(self, texts):
+            self.calls.append(list(texts))
+            return [type("E", (), {"values": [1.0, float(len(t))]}) for t in texts]
+
+    model = Model()
+    service = EmbeddingService(
+        model_name="text-embedding-005",
+        cache=SqliteEmbeddingCache(str(tmp_path / "cache.db")),
+    )
+    service._model = model
+    first = service.embed_texts(["a", "bb"])
+    second = service.embed_texts(["bb", "a", "ccc"])
+    assert model.calls == [["a", "bb"], ["ccc"]]
+    assert np.allclose(second[:2], [first[1], first[0]], atol=1e-6)
+
+
+def test_store_uses_sqlite_cache_without_database(tmp_path, monkeypatch):
+    from api.documents import HybridVectorStore
+
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setenv("EMBEDDING_MODEL", "text-embedding-005")
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "cache.db"))
+    store = HybridVectorStore()
+    assert isinstance(store.embeddings.cache, SqliteEmbeddingCache)
@@ -0,0 +1,135 @@
+import math
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from rag import embeddings
+from rag.embeddings import EmbeddingService, content_key
+
+
+def encode(text):
+    """Return a unit vector that identifies ``text``."""
+    return [math.cos(float(text)), math.sin(float(text))]
+
+
+class StubModel:
+    def __init__(self):
+        self.batch_sizes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_embeddings(self, texts):
+        with self._lock:
+            self.batch_sizes.append(len(texts))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        with self._lock:
+            self.in_flight -= 1
+        return [SimpleNamespace(values=encode(t)) for t in texts]
+
+
+def make_service(model):
+    service = EmbeddingService(model_name="text-embedding-005")
+    service._model = model
+    return service
+
+
+def test_batches_respect_provider_limit():
+    texts = [str(i) for i in range(embeddings.MAX_BATCH_SIZE * 2 + 1)]
+    batches = EmbeddingService._batches(texts)
+    assert [len(b) for b in batches] == [
+        embeddings.MAX_BATCH_SIZE,
+        embeddings.MAX_BATCH_SIZE,
+        1,
+    ]
+    assert [t for b in batches for t in b] == texts
+
+
+def test_batches_respect_token_budget():
+    # 256 chunks of ~1000 characters, as queued by the GCS ingest writer.
+    texts = ["x" * 999 for _ in range(256)]
+    batches = EmbeddingService._batches(texts)
+    per_text = 999 // embeddings.CHARS_PER_TOKEN + 1
+    assert all(len(b) * per_text <= embeddings.MAX_BATCH_TOKENS for b in batches)
+    assert len(batches) == -(-256 // (embeddings.MAX_BATCH_TOKENS // per_text))
+    assert [t for b in batches for t in b] == texts
+
+
+def test_oversized_text_is_sent_alone():
+    huge = "x" * (embeddings.MAX_BATCH_TOKENS * embeddings.CHARS_PER_TOKEN)
+    batches = EmbeddingService._batches(["a", huge, "b"])
+    assert batches == [["a"], [huge], ["b"]]
+
+
+def test_embed_texts_preserves_order_across_batches():
+    model = StubModel()
+    texts = [str(i) for i in range(embeddings.MAX_BATCH_SIZE * 3 + 7)]
+    vectors = make_service(model).embed_texts(texts)
+    assert np.allclose(vectors, [encode(t) for t in texts])
+    assert max(model.batch_sizes) <= embeddings.MAX_BATCH_SIZE
+
+
+def test_embed_texts_empty_input_makes_no_request():
+    model = StubModel()
+    assert make_service(model).embed_texts([]) == []
+    assert model.batch_sizes == []
+
+
+def test_concurrent_callers_share_request_limit():
+    model = StubModel()
+    service = make_service(model)
+    texts = [str(i) for i in range(embeddings.MAX_BATCH_SIZE * 4)]
+    threads = [
+        threading.Thread(target=service.embed_texts, args=(texts,)) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert model.max_in_flight <= embeddings.MAX_CONCURRENT_REQUESTS
+
+
+class DictCache:
+    def __init__(self):
+        self.entries = {}
+        self.lookups = []
+
+    def get_many(self, keys):
+        self.lookups.append(sorted(keys))
+        return {k: self.entries[k] for k in keys if k in self.entries}
+
+    def put_many(self, embeddings):
+        for key, vector in embeddings.items():
+            self.entries.setdefault(key, vector)
+
+
+def test_content_key_depends_on_model_and_text():
+    key = content_key("model-a", "text")
+    assert len(key) == 32
+    assert key == content_key("model-a", "text")
+    assert key != content_key("model-b", "text")
+    assert key != content_key("model-a", "other")
+
+
+def test_cached_embeddings_only_embed_misses():
+    model, cache = StubModel(), DictCache()
+    service = make_service(model)
+    service.cache = cache
+    assert np.allclose(service.embed_texts(["1", "2", "1"]), [encode(t) for t in "121"])
+    assert model.batch_sizes == [2]
+    assert np.allclose(service.embed_texts(["2", "3", "1"]), [encode(t) for t in "231"])
+    assert model.batch_sizes == [2, 1]
+    assert len(cache.entries) == 3
+
+
+def test_embeddings_are_scaled_to_unit_length():
+    class ScaledModel:
+        def get_embeddings(self, texts):
+            return [SimpleNamespace(values=[3.0, 4.0]), SimpleNamespace(values=[0.0, 0.0])]
+
+    service = make_service(ScaledModel())
+    assert service.embed_texts(["a", "b"]) == [[0.6, 0.8], [0.0, 0.0]]
@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+
+from rag import rag_graph
+
+os.environ.setdefault("GEMINI_API_KEY", "dummy")
+
+
+class FakeBlob:
+    def __init__(self, bucket, name, generation):
+        self.bucket, self.name = bucket, name
+        assert generation == bucket.generations.get(name, 1)
+
+    def download_as_bytes(self):
+        return self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    def __init__(self, name, objects, generations=None):
+        self.name, self.objects = name, objects
+        self.generations = generations or {}
+        self.downloads = []
+
+    def blob(self, name, generation=None):
+        self.downloads.append(name)
+        return FakeBlob(self, name, generation)
+
+
+class BlobPage(list):
+    def __init__(self):
+        super().__init__()
+        self.prefixes = set()
+
+
+class FakeClient:
+    def __init__(self, bucket):
+        self._bucket = bucket
+        self.listings = []
+
+    def bucket(self, name):
+        assert name == self._bucket.name
+        return self._bucket
+
+    def list_blobs(self, bucket, prefix="", delimiter=None, match_glob=None, fields=None):
+        self.listings.append((prefix, delimiter, match_glob))
+        page = BlobPage()
+        for name in sorted(bucket.objects):
+            if not name.startswith(prefix):
+                continue
+            rest = name[len(prefix) :]
+            if delimiter and delimiter in rest:
+                page.prefixes.add(prefix + rest.split(delimiter)[0] + delimiter)
+            elif match_glob is None or name.lower().endswith(".pdf"):
+                page.append(
+                    SimpleNamespace(
+                        name=name,
+                        size=len(bucket.objects[name]),
+                        generation=bucket.generations.get(name, 1),
+                    )
+                )
+        return page
+
+
+class FakeProcessor:
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def process_bytes(self, data, source):
+        with self.lock:
+            FakeProcessor.in_flight += 1
+            FakeProcessor.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            FakeProcessor.in_flight -= 1
+        if data == b"broken":
+            raise ValueError("not a pdf")
+        return [
+            Document(page_content=part, metadata={"source": source})
+            for part in data.decode().split()
+        ]
+
+
+class FakeStore:
+    def __init__(self):
+        self.docs = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add_documents(self, docs):
+        if any(d.page_content == "poison" for d in docs):
+            raise RuntimeError("insert failed")
+        with self._lock:
+            self.calls += 1
+            self.docs.extend(docs)
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    from agent import rag_graph as agent_rag_graph
+
+    def run(objects, workers=4, batch=256, state_dir=None, generations=None):
+        bucket = FakeBucket("bucket", objects, generations)
+        store = FakeStore()
+        FakeProcessor.in_flight = FakeProcessor.max_in_flight = 0
+        monkeypatch.setattr(rag_graph, "_get_storage_client", lambda project: FakeClient(bucket))
+        monkeypatch.setattr(rag_graph, "DocumentProcessor", FakeProcessor)
+        monkeypatch.setattr(rag_graph, "INGEST_WORKERS", workers)
+        monkeypatch.setattr(rag_graph, "INGEST_BATCH", batch)
+        monkeypatch.setattr(rag_graph, "INGEST_STATE_DIR", state_dir)
+        monkeypatch.setattr(agent_rag_graph, "_vector_store", store)
+        result = rag_graph.rag_load_data_from_gcs(
+            {"gcs_bucket_name": "bucket", "error_messages": ["earlier"]}, {}
+        )
+        return result, store, bucket
+
+    return run
+
+
+def test_loads_pdfs_in_parallel_and_reports_errors(ingest):
+    objects = {f"doc{i}.pdf": f"a{i} b{i}".encode() for i in range(8)}
+    objects["bad.PDF"] = b"broken"
+    objects["notes.txt"] = b"skipped"
+    result, store, bucket = ingest(objects)
+    assert result["documents_loaded"] == 16
+    assert result["error_messages"] == ["earlier", "gs://bucket/bad.PDF: not a pdf"]
+    assert "notes.txt" not in bucket.downloads
+    assert {d.metadata["source"] for d in store.docs} == {
+        f"gs://bucket/doc{i}.pdf" for i in range(8)
+    }
+    assert 1 < FakeProcessor.max_in_flight <= 4
+
+
+def test_chunks_from_several_pdfs_share_batches(ingest):
+    objects = {f"doc{i}.pdf": f"a{i} b{i} c{i}".encode() for i in range(10)}
+    result, store, _ = ingest(objects, batch=8)
+    assert result["documents_loaded"] == 30
+    # Each full batch holds at least 8 chunks; the final flush takes the rest.
+    assert store.calls <= 4
+    assert len(store.docs) == 30
+
+
+def test_failed_batch_is_reported_with_its_sources(ingest):
+    objects = {"good.pdf": b"fine", "bad.pdf": b"poison"}
+    result, store, _ = ingest(objects, workers=1)
+    assert result["documents_loaded"] == 0
+    assert result["error_messages"] == [
+        "earlier",
+        "gs://bucket/bad.pdf, gs://bucket/good.pdf: insert failed",
+    ]
+
+
+def test_duplicate_chunks_are_indexed_once(ingest):
+    objects = {"a.pdf": b"header alpha", "b.pdf": b"header beta header"}
+    result, store, _ = ingest(objects)
+    assert sorted(d.page_content for d in store.docs) == ["alpha", "beta", "header"]
+    assert result["documents_loaded"] == 3
+
+
+def test_chunks_from_earlier_runs_are_skipped(ingest, tmp_path):
+    state_dir = str(tmp_path / "state")
+    ingest({"a.pdf": b"one two"}, state_dir=state_dir)
+    result, store, _ = ingest({"a.pdf": b"one two", "b.pdf": b"two three"}, state_dir=state_dir)
+    assert [d.page_content for d in store.docs] == ["three"]
+    assert result["documents_loaded"] == 1
+
+
+def test_failed_chunks_are_retried_next_run(ingest, tmp_path):
+    state_dir = str(tmp_path / "state")
+    result, _, _ = ingest({"a.pdf": b"poison"}, state_dir=state_dir)
+    assert result["documents_loaded"] == 0
+    assert rag_graph._read_hashes(str(tmp_path / "state" / "bucket.chunks")) == set()
+
+
+def test_listing_fans_out_over_top_level_prefixes():
+    objects = {
+        "root.pdf": b"",
+        "ROOT.Pdf": b"",
+        "root.pdf.txt": b"",
+        "root.txt": b"",
+        "a/one.pdf": b"",
+        "a/deep/two.PDF": b"",
+        "b/three.txt": b"",
+    }
+    bucket = FakeBucket("bucket", objects)
+    client = FakeClient(bucket)
+    names = [blob.name for blob in rag_graph._list_pdfs(client, bucket)]
+    assert sorted(names) == ["ROOT.Pdf", "a/deep/two.PDF", "a/one.pdf", "root.pdf"]
+    assert sorted(client.listings[1:]) == [
+        ("a/", None, rag_graph.PDF_GLOB),
+        ("b/", None, rag_graph.PDF_GLOB),
+    ]
+
+
+def test_progress_is_logged_per_pdf_at_debug(ingest, caplog):
+    import logging
+
+    with caplog.at_level(logging.DEBUG, logger="rag.rag_graph"):
+        ingest({"a.pdf": b"one", "bad.pdf": b"broken"})
+    debug = [r.getMessage() for r in caplog.records if r.levelno == logging.DEBUG]
+    info = [r.getMessage() for r in caplog.records if r.levelno == logging.INFO]
+    assert sorted(debug) == [
+        "Failed to load gs://bucket/bad.pdf",
+        "Split gs://bucket/a.pdf into 1 chunks",
+    ]
+    assert info == [
+        "Loading 2 PDFs from gs://bucket",
+        "Indexed 1 chunks from gs://bucket with 1 errors",
+    ]
+
+
+def test_oversized_pdfs_are_skipped_before_download(ingest, monkeypatch, caplog):
+    monkeypatch.setattr(rag_graph, "MAX_PDF_BYTES", 8)
+    result, store, bucket = ingest({"small.pdf": b"tiny", "big.pdf": b"far too large"})
+    assert bucket.downloads == ["small.pdf"]
+    assert [d.page_content for d in store.docs] == ["tiny"]
+    assert "gs://bucket/big.pdf" in caplog.text
+
+
+def test_unchanged_pdfs_are_not_downloaded_again(ingest, tmp_path):
+    state_dir = str(tmp_path / "state")
+    objects = {"a.pdf": b"one", "b.pdf": b"two", "bad.pdf": b"broken"}
+    ingest(objects, state_dir=state_dir)
+    _, _, bucket = ingest(objects, state_dir=state_dir, generations={"b.pdf": 2})
+    assert sorted(bucket.downloads) == ["b.pdf", "bad.pdf"]
+
+
+def test_pdfs_in_failed_batches_are_retried_next_run(ingest, tmp_path):
+    state_dir = str(tmp_path / "state")
+    ingest({"a.pdf": b"poison"}, state_dir=state_dir)
+    _, _, bucket = ingest({"a.pdf": b"poison"}, state_dir=state_dir)
+    assert bucket.downloads == ["a.pdf"]
+
+
+def test_storage_client_is_reused(monkeypatch):
+    import sys
+
+    created = []
+    fake_storage = SimpleNamespace(Client=lambda project: created.append(project))
+    google_cloud = SimpleNamespace(storage=fake_storage)
+    monkeypatch.setitem(sys.modules, "google.cloud", google_cloud)
+    monkeypatch.setitem(sys.modules, "google.cloud.storage", fake_storage)
+    rag_graph._get_storage_client.cache_clear()
+    try:
+        rag_graph._get_storage_client("p1")
+        rag_graph._get_storage_client("p1")
+        rag_graph._get_storage_client("p2")
+    finally:
+        rag_graph._get_storage_client.cache_clear()
+    assert created == ["p1", "p2"]
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = (
+    "sklearn",
+    "pypdf",
+    "pdfminer",
+    "vertexai",
+    "psycopg",
+    "langchain_text_splitters",
+    "langchain_community",
+)
+
+
+def loaded_after_import(module):
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return result.stdout.split()
+
+
+def test_documents_api_defers_heavy_imports():
+    assert loaded_after_import("api.documents") == []
+
+
+def test_rag_package_defers_heavy_imports():
+    assert loaded_after_import("rag.embeddings") == []
+    assert loaded_after_import("rag.vector_store") == []
+    assert loaded_after_import("rag.rag_graph") == []
@@ -0,0 +1,20 @@
+import os
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("GEMINI_API_KEY", "dummy")
+import main
+from agent.rag_graph import get_vector_store
+
+
+def test_lifespan_shares_one_processor_and_store(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL", raising=False)
+    with TestClient(main.app) as client:
+        processor = main.app.state.processor
+        store = main.app.state.store
+        assert store is get_vector_store()
+        response = client.post("/api/documents/query", json={"query": "x"})
+        assert response.status_code == 200
+        assert response.json() == []
+        assert main.app.state.processor is processor
@@ -21,3 +21,70 @@ def test_use_documents_routs_to_rag():
 
     result = graph.invoke(state)
     assert result["messages"][-1].content == ""
+
+
+class FakeStore:
+    def __init__(self):
+        self.embedded = []
+        self.vectors = []
+
+    def embed_queries(self, queries):
+        self.embedded.append(list(queries))
+        return [[float(len(q))] for q in queries]
+
+    def similarity_search_by_vector(self, embedding):
+        from langchain_core.documents import Document
+
+        self.vectors.append(embedding)
+        return [Document(page_content="chunk")]
+
+
+def test_retrieve_documents_queries_latest_question(monkeypatch):
+    from langchain_core.messages import AIMessage
+
+    from agent import rag_graph
+
+    store = FakeStore()
+    monkeypatch.setattr(rag_graph, "_vector_store", store)
+    state = {
+        "messages": [
+            HumanMessage(content="first question"),
+            AIMessage(content="answer"),
+            HumanMessage(content="second question"),
+        ]
+    }
+
+    result = rag_graph.retrieve_documents(state, {})
+    assert store.embedded == [["second question"]]
+    assert result["messages"][-1].content == "chunk"
+    assert result["query_embeddings"] == {"second question": [15.0]}
+
+
+def test_retrieve_documents_reuses_embedding_of_same_question(monkeypatch):
+    from agent import rag_graph
+
+    store = FakeStore()
+    monkeypatch.setattr(rag_graph, "_vector_store", store)
+    state = {
+        "messages": [HumanMessage(content="question")],
+        "query_embeddings": {"question": [0.5]},
+    }
+
+    result = rag_graph.retrieve_documents(state, {})
+    assert store.embedded == []
+    assert store.vectors == [[0.5]]
+    assert result["query_embeddings"] == {"question": [0.5]}
+
+
+def test_query_embeddings_keep_only_latest_question(monkeypatch):
+    from agent import rag_graph
+
+    store = FakeStore()
+    monkeypatch.setattr(rag_graph, "_vector_store", store)
+    state = {
+        "messages": [HumanMessage(content="new question")],
+        "query_embeddings": {"old question": [0.5]},
+    }
+
+    result = rag_graph.retrieve_documents(state, {})
+    assert result["query_embeddings"] == {"new question": [12.0]}
@@ -0,0 +1,65 @@
+import numpy as np
+
+from rag import semantic_cache
+from rag.semantic_cache import SemanticCache
+
+
+def unit(seed, dim=8):
+    vector = np.random.default_rng(seed).standard_normal(dim)
+    return vector / np.linalg.norm(vector)
+
+
+def test_hit_for_near_duplicate_query():
+    cache = SemanticCache(dimension=8, threshold=0.95)
+    query = unit(0)
+    cache.put(query, "cached")
+    assert cache.get(query) == "cached"
+    assert cache.get(query * 3.0) == "cached"
+
+
+def test_miss_below_threshold():
+    cache = SemanticCache(dimension=8, n_projections=1, threshold=0.95)
+    query = unit(0)
+    other = query + 0.8 * unit(1)
+    assert float(query @ other / np.linalg.norm(other)) < 0.95
+    cache.put(query, "cached")
+    assert cache.get(other) is None
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(dimension=8, ttl=10.0)
+    cache.put(unit(0), "cached")
+    now[0] += 9.0
+    assert cache.get(unit(0)) == "cached"
+    now[0] += 2.0
+    assert cache.get(unit(0)) is None
+
+
+def test_bucket_evicts_oldest_entries():
+    cache = SemanticCache(dimension=8, n_projections=1, threshold=0.999, bucket_size=2)
+    base = unit(0)
+    queries = [base + 0.01 * unit(i) for i in range(1, 4)]
+    # Force a single bucket so eviction is deterministic.
+    cache._projections[:] = base
+    for i, query in enumerate(queries):
+        cache.put(query, i)
+    assert cache.get(queries[0]) in (1, 2)
+    assert len(next(iter(cache._buckets.values()))) == 2
+
+
+def test_clear_drops_everything():
+    cache = SemanticCache(dimension=8)
+    cache.put(unit(0), "cached")
+    cache.clear()
+    assert cache.get(unit(0)) is None
+
+
+def test_cache_namespaces_are_separate():
+    cache = SemanticCache(dimension=8)
+    cache.put(unit(0), "all")
+    cache.put(unit(0), "a.pdf only", namespace="a.pdf")
+    assert cache.get(unit(0)) == "all"
+    assert cache.get(unit(0), namespace="a.pdf") == "a.pdf only"
+    assert cache.get(unit(0), namespace="b.pdf") is None
@@ -0,0 +1,199 @@
+import threading
+import time
+
+from langchain_core.documents import Document
+
+from rag import vector_store
+from rag.vector_store import HybridVectorStore
+
+
+class FakeStore:
+    """Match documents containing the query; ``distances`` maps text to score."""
+
+    def __init__(self, texts=(), delay=0.0, distances=None, barrier=None):
+        self.docs = [Document(page_content=text) for text in texts]
+        self.delay = delay
+        self.barrier = barrier
+        self.distances = distances or {}
+        self.searches = 0
+        self.added = threading.Event()
+
+    def similarity_search_with_score_by_vector(self, query, k=4):
+        self.searches += 1
+        time.sleep(self.delay)
+        if self.barrier is not None:
+            # Raises BrokenBarrierError unless the other tier is searching too.
+            self.barrier.wait(timeout=5)
+        matches = [
+            (d, self.distances.get(d.page_content, 0.5))
+            for d in self.docs
+            if query in d.page_content
+        ]
+        return sorted(matches, key=lambda pair: pair[1])[:k]
+
+    similarity_search_by_vector_with_relevance_scores = (
+        similarity_search_with_score_by_vector
+    )
+
+    def similarity_search_by_vector(self, query, k=4):
+        return [d for d, _ in self.similarity_search_with_score_by_vector(query, k)]
+
+    def add_documents(self, docs):
+        self.docs.extend(docs)
+        self.added.set()
+
+
+class FakeEmbedder:
+    """Use the query text itself as its vector."""
+
+    def __init__(self):
+        self.queries = []
+
+    def embed_query(self, query):
+        self.queries.append(query)
+        return query
+
+
+def make_store(hot, cold):
+    store = object.__new__(HybridVectorStore)
+    store._embedding_function = FakeEmbedder()
+    store._hot_store = hot
+    store._database_url = None if cold is None else "postgresql://db"
+    if cold is not None:
+        store._cold_store = cold
+    store._hits = vector_store.Counter()
+    store._hits_lock = threading.Lock()
+    return store
+
+
+def test_frequent_cold_hits_are_promoted(monkeypatch):
+    monkeypatch.setattr(vector_store, "HOT_PROMOTION_THRESHOLD", 2)
+    hot, cold = FakeStore(), FakeStore(["popular chunk"])
+    store = make_store(hot, cold)
+    assert [d.page_content for d in store.similarity_search("popular", k=1)] == [
+        "popular chunk"
+    ]
+    assert not hot.docs
+    store.similarity_search("popular", k=1)
+    assert hot.added.wait(1)
+    assert [d.page_content for d in hot.docs] == ["popular chunk"]
+    assert [d.page_content for d in store.similarity_search("popular", k=1)] == [
+        "popular chunk"
+    ]
+
+
+def test_promoted_chunks_are_not_returned_twice():
+    hot, cold = FakeStore(["shared chunk"]), FakeStore(["shared chunk", "shared other"])
+    store = make_store(hot, cold)
+    results = store.similarity_search("shared", k=3)
+    assert [d.page_content for d in results] == ["shared chunk", "shared other"]
+
+
+def test_hot_and_cold_queries_overlap():
+    both_searching = threading.Barrier(2)
+    hot = FakeStore(["hot match"], barrier=both_searching)
+    cold = FakeStore(["cold match"], barrier=both_searching)
+    store = make_store(hot, cold)
+    results = store.similarity_search("match", k=2)
+    assert [d.page_content for d in results] == ["hot match", "cold match"]
+
+
+def test_without_cold_store_only_hot_is_searched():
+    store = make_store(FakeStore(["only hot"]), None)
+    assert [d.page_content for d in store.similarity_search("only")] == ["only hot"]
+
+
+def test_cold_store_is_created_once_on_first_use(monkeypatch):
+    import langchain_community.vectorstores as stores
+
+    created = []
+
+    class FakePGVector(FakeStore):
+        def __init__(self, **kwargs):
+            super().__init__(["cold match"], delay=0.05)
+            created.append(kwargs)
+
+    monkeypatch.setattr(stores, "PGVector", FakePGVector)
+    store = make_store(FakeStore(), None)
+    store._database_url = "postgresql://db"
+    store._init_lock = threading.Lock()
+    assert created == []
+    threads = [
+        threading.Thread(target=store.similarity_search, args=("match",))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert created[0]["engine_args"] == vector_store.COLD_POOL_ARGS
+
+
+def test_add_to_cold_tier_requires_database_url():
+    import pytest
+
+    from rag.embeddings import ConfigError
+
+    with pytest.raises(ConfigError):
+        make_store(FakeStore(), None).add_documents([], tier="cold")
+
+
+def test_query_is_embedded_once_for_both_tiers():
+    hot, cold = FakeStore(["hot match"]), FakeStore(["cold match"])
+    store = make_store(hot, cold)
+    store.similarity_search("match", k=2)
+    assert store._embedding_function.queries == ["match"]
+    assert hot.searches == cold.searches == 1
+
+
+def test_results_from_both_tiers_are_ranked_by_distance():
+    hot = FakeStore(
+        ["match hot near", "match hot far"],
+        distances={"match hot near": 0.1, "match hot far": 0.9},
+    )
+    cold = FakeStore(
+        ["match cold", "match hot near"],
+        distances={"match cold": 0.3, "match hot near": 0.1},
+    )
+    store = make_store(hot, cold)
+    results = store.similarity_search("match", k=2)
+    assert [d.page_content for d in results] == ["match hot near", "match cold"]
+
+
+def test_hot_store_is_opened_on_first_use(monkeypatch):
+    import langchain_community.vectorstores as stores
+
+    created = []
+
+    class FakeChroma(FakeStore):
+        def __init__(self, **kwargs):
+            super().__init__(["hot match"])
+            created.append(kwargs)
+
+    monkeypatch.setattr(stores, "Chroma", FakeChroma)
+    monkeypatch.setenv("CHROMA_PERSIST_DIR", "/tmp/chroma")
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    store = HybridVectorStore(FakeEmbedder())
+    store.persist()
+    assert created == []
+    assert [d.page_content for d in store.similarity_search("match")] == ["hot match"]
+    assert [kwargs["persist_directory"] for kwargs in created] == ["/tmp/chroma"]
+
+
+def test_empty_persist_dir_disables_hot_tier(monkeypatch):
+    import pytest
+
+    from rag.embeddings import ConfigError
+
+    monkeypatch.setenv("CHROMA_PERSIST_DIR", "")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://db")
+    monkeypatch.setattr(vector_store, "HOT_PROMOTION_THRESHOLD", 1)
+    store = HybridVectorStore(FakeEmbedder())
+    cold = FakeStore(["cold match"])
+    store._cold_store = cold
+    assert [d.page_content for d in store.similarity_search("match")] == ["cold match"]
+    assert not store._hits
+    with pytest.raises(ConfigError):
+        store.add_documents([], tier="hot")
+    store.persist()